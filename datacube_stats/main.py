@@ -5,15 +5,20 @@ This command is run as ``datacube-stats``, all operation are driven by a configu
 
 """
 import copy
+import hashlib
+import json
 import logging
+import os
 import sys
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from itertools import islice
 from textwrap import dedent
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Iterable, Iterator, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
 from os import path
 
 import click
@@ -22,6 +27,8 @@ import pandas as pd
 import pydash
 import rasterio.features
 import xarray
+import yaml
+from boltons import fileutils
 from dateutil import tz
 import datacube
 import datacube_stats
@@ -39,8 +46,9 @@ from datacube_stats.utils import tile_iter, sensible_mask_invalid_data, sensible
 from datacube_stats.utils.dates import date_sequence
 from datacube_stats.utils.timer import MultiTimer, wrap_in_timer
 from datacube_stats.utils import sorted_interleave, Slice, prettier_slice
-from datacube_stats.tasks import select_task_generator
+from datacube_stats.tasks import select_task_generator, DEFAULT_MAX_CONCURRENT_QUERIES
 from datacube_stats.schema import stats_schema
+from datacube_stats.stat_funcs import kernels_threadsafe
 from datacube_stats.models import StatsTask, DataSource
 
 __all__ = ['StatsApp', 'main']
@@ -130,6 +138,8 @@ def with_or_without_qsub_runner():
               help="The subset of tasks to perform, using Python's slice syntax.")
 @click.option('--batch', type=int,
               help="The number of batch jobs to launch using PBS and the serial executor.")
+@click.option('--max-concurrent-queries', type=click.IntRange(min=1),
+              help='Override the number of index queries run at once when generating tasks')
 @click.option('--list-statistics', is_flag=True, callback=list_statistics, expose_value=False)
 @ui.global_cli_options
 @with_or_without_qsub_runner()
@@ -137,7 +147,7 @@ def with_or_without_qsub_runner():
               expose_value=False, is_eager=True)
 @ui.pass_index(app_name='datacube-stats')
 def main(index, stats_config_file, qsub, runner, save_tasks, load_tasks,
-         tile_index, tile_index_file, output_location, year, task_slice, batch):
+         tile_index, tile_index_file, output_location, year, task_slice, batch, max_concurrent_queries):
 
     try:
         _log_setup()
@@ -162,9 +172,10 @@ def main(index, stats_config_file, qsub, runner, save_tasks, load_tasks,
         timer = MultiTimer().start('main')
 
         config = normalize_config(read_config(stats_config_file),
-                                  tile_index, tile_index_file, year, output_location)
+                                  tile_index, tile_index_file, year, output_location, max_concurrent_queries)
 
         app = StatsApp(config, index)
+        app.validate_sources(index)
         app.log_config()
 
         if save_tasks is not None:
@@ -196,14 +207,63 @@ def _log_setup():
     _LOG.debug('Running against datacube-core %s from %s', datacube.__version__, datacube.__path__)
 
 
+#: Environment variable naming a directory to cache parsed configuration files in
+CONFIG_CACHE_ENV = 'DATACUBE_STATS_CONFIG_CACHE'
+
+
 def read_config(stats_config_file):
-    _, config = next(read_documents(stats_config_file))
+    config = _read_config_document(stats_config_file)
     stats_schema(config)
     return config
 
 
+def _parse_config_document(stats_config_file):
+    # `read_documents` uses the LibYAML `CSafeLoader` when PyYAML was built with it, and silently falls back
+    if not getattr(yaml, '__with_libyaml__', False):
+        _LOG.warning('PyYAML is installed without LibYAML, %s is parsed with the slower pure Python loader. '
+                     'Install libyaml and reinstall PyYAML for faster configuration parsing.', stats_config_file)
+    _, config = next(read_documents(stats_config_file))
+    return config
+
+
+def _read_config_document(stats_config_file):
+    """
+    Parse the configuration file, re-using a previously parsed copy if :data:`CONFIG_CACHE_ENV` is set.
+
+    The cache is keyed by a hash of the file contents, so an edited file is always parsed again.
+    Entries are stored as JSON, which is all the parsed document contains, since `read_documents`
+    does not convert dates.
+    """
+    cache_dir = os.environ.get(CONFIG_CACHE_ENV)
+    if not cache_dir:
+        return _parse_config_document(stats_config_file)
+
+    config_path = Path(stats_config_file)
+    digest = hashlib.blake2b(config_path.read_bytes()).hexdigest()
+    cache_file = Path(cache_dir) / '{}.{}.json'.format(config_path.name, digest)
+
+    try:
+        with cache_file.open() as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        _LOG.warning('Ignoring unreadable config cache %s: %s', cache_file, e)
+
+    config = _parse_config_document(stats_config_file)
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with fileutils.atomic_save(str(cache_file), text_mode=True) as f:
+            json.dump(config, f)
+    except OSError as e:
+        _LOG.warning('Unable to write config cache %s: %s', cache_file, e)
+
+    return config
+
+
 def normalize_config(config, tile_index=None, tile_index_file=None,
-                     year=None, output_location=None):
+                     year=None, output_location=None, max_concurrent_queries=None):
     if tile_index is not None and len(tile_index) == 0:
         tile_index = None
 
@@ -231,6 +291,8 @@ def normalize_config(config, tile_index=None, tile_index_file=None,
     config['location'] = output_location or config.get('location', '')
 
     config['computation'] = config.get('computation', {})
+    if max_concurrent_queries is not None:
+        config['computation']['max_concurrent_queries'] = max_concurrent_queries
     config['filter_product'] = config.get('filter_product', {})
 
     config['global_attributes'] = config.get('global_attributes', {})
@@ -280,7 +342,9 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
         #: Generates tasks to compute statistics. These tasks should be :class:`StatsTask` objects
         #: and will define spatial and temporal boundaries, as well as statistical operations to be run.
         self.task_generator = select_task_generator(config['input_region'],
-                                                    self.storage, self.filter_product)
+                                                    self.storage, self.filter_product,
+                                                    max_concurrent_queries=self.computation.get(
+                                                        'max_concurrent_queries', DEFAULT_MAX_CONCURRENT_QUERIES))
 
         #: A class which knows how to create and write out data to a permanent storage format.
         #: Implements :class:`.output_drivers.OutputDriver`.
@@ -289,12 +353,16 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
         self.global_attributes = config['global_attributes']
         self.var_attributes = config['var_attributes']
 
+        #: Source product definitions looked up from the index, by name
+        self._products = {}
+
         self.validate()
 
     def validate(self):
         """Check StatsApp is correctly configured and raise an error if errors are found."""
         self._ensure_unique_output_product_names()
         self._check_consistent_measurements()
+        self._check_chunk_alignment()
 
         assert callable(self.task_generator)
         assert callable(self.output_driver)
@@ -303,16 +371,47 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
 
         _LOG.debug('config file is valid.')
 
+    def validate_sources(self, index):
+        """
+        Check the configured source and mask products exist in the index and define the requested measurements,
+        so that configuration errors are reported before any task is generated.
+        """
+        def check_measurements(product_name, requested):
+            product = _get_product(index, product_name, self._products)
+            if product is None:
+                raise StatsConfigurationError('Source product %s was not found in the index' % product_name)
+
+            missing = [name for name in requested if name not in product.measurements]
+            if missing:
+                raise StatsConfigurationError('Some of the requested measurements were not present in the product '
+                                              'definition of %s: %s' % (product_name, ', '.join(missing)))
+
+        for source in self.sources:
+            check_measurements(source['product'], source.get('measurements', []))
+            for mask in source.get('masks', []):
+                check_measurements(mask['product'], [mask['measurement']] if 'measurement' in mask else [])
+
     def _check_consistent_measurements(self):
         """Part of configuration validation"""
-        try:
-            first_source = self.sources[0]
-        except IndexError:
+        if not self.sources:
             raise StatsConfigurationError('No data sources specified.')
-        if not all(first_source.get('measurements') == source.get('measurements') for source in self.sources):
+        if len({_measurements_signature(source) for source in self.sources}) > 1:
             raise StatsConfigurationError("Configuration Error: listed measurements of source products "
                                           "are not all the same.")
 
+    def _check_chunk_alignment(self):
+        """Part of configuration validation"""
+        storage_chunking = self.storage.get('chunking', {})
+        computation_chunking = self.computation.get('chunking', {})
+
+        misaligned = {dim: (storage_chunking[dim], size)
+                      for dim, size in computation_chunking.items()
+                      if dim in storage_chunking and size % storage_chunking[dim] != 0}
+        if misaligned:
+            # each chunk written covers partial storage chunks, which have to be read back and re-written
+            _LOG.warning('Computation chunking is not a multiple of storage chunking (storage, computation): %s. '
+                         'Output files will be written inefficiently.', misaligned)
+
     def _ensure_unique_output_product_names(self):
         """Part of configuration validation"""
         output_names = [prod['name'] for prod in self.output_product_specs]
@@ -345,7 +444,9 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
         try:
             execute_task(task,
                          output_driver=self._partially_applied_output_driver(),
-                         chunking=self.computation.get('chunking', {}))
+                         chunking=self.computation.get('chunking', {}),
+                         num_threads=self.computation.get('num_threads', 1),
+                         dtype=self.computation.get('dtype', 'float32'))
 
             _LOG.debug('task %s finished', task)
         except OutputDriverResult as e:
@@ -361,7 +462,9 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
         output_driver = self._partially_applied_output_driver()
         task_runner = partial(execute_task,
                               output_driver=output_driver,
-                              chunking=self.computation.get('chunking', {}))
+                              chunking=self.computation.get('chunking', {}),
+                              num_threads=self.computation.get('num_threads', 1),
+                              dtype=self.computation.get('dtype', 'float32'))
 
         # does not need to be thorough for now
         task_desc = TaskDescription(type_='datacube_stats',
@@ -423,8 +526,16 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
 
         is_iterative = all(op.is_iterative() for op in output_products.values())
 
+        # e.g. from repeated tiles or date ranges, which would only compute the same outputs again
+        seen = set()
         for task in self.task_generator(index=index, date_ranges=self.date_ranges,
                                         sources_spec=self.sources):
+            key = task.key()
+            if key in seen:
+                _LOG.warning('Skipping duplicate task %s', task)
+                continue
+            seen.add(key)
+
             task.output_products = output_products
             task.is_iterative = is_iterative
             yield task
@@ -439,7 +550,7 @@ class StatsApp:  # pylint: disable=too-many-instance-attributes
 
         output_products = {}
 
-        measurements = _source_measurement_defs(index, self.sources)
+        measurements = _source_measurement_defs(index, self.sources, products=self._products)
 
         metadata_type = index.metadata_types.get_by_name(metadata_type)
 
@@ -487,25 +598,42 @@ def geometry_mask(geoms: Iterable[Geometry], geobox: GeoBox,
                                            invert=invert)
 
 
-def execute_task(task: StatsTask, output_driver, chunking) -> StatsTask:
+def execute_task(task: StatsTask, output_driver, chunking, num_threads=1, dtype='float32') -> StatsTask:
     """
     Load data, run the statistical operations and write results out to the filesystem.
 
     :param datacube_stats.models.StatsTask task:
     :type output_driver: OutputDriver
     :param chunking: dict of dimension sizes to chunk the computation by
+    :param num_threads: number of chunks to load and compute concurrently
+    :param dtype: floating point type integer data is converted to when masking `nodata`
     """
     timer = MultiTimer().start('total')
 
     process_chunk = load_process_save_chunk_iteratively if task.is_iterative else load_process_save_chunk
 
     try:
+        _warmup_statistics(task)
+
         with output_driver(task=task) as output_files:
             # currently for polygons process will load entirely
             if len(chunking) == 0:
                 chunking = {'x': task.sample_tile.shape[2], 'y': task.sample_tile.shape[1]}
-            for sub_tile_slice in tile_iter(task.sample_tile, chunking):
-                process_chunk(output_files, sub_tile_slice, task, timer)
+            sub_tile_slices = tile_iter(task.sample_tile, chunking)
+            if num_threads > 1 and not output_files.allows_concurrent_loading:
+                _LOG.warning('%s output can not be written while loading data on other threads, '
+                             'processing chunks one at a time', type(output_files).__name__)
+                num_threads = 1
+            if num_threads > 1 and not kernels_threadsafe():
+                _LOG.warning("numba's workqueue threading layer can not run kernels concurrently, "
+                             "processing chunks one at a time, install tbb to avoid this")
+                num_threads = 1
+            if num_threads > 1 and not task.is_iterative:
+                load_process_save_chunks_concurrently(output_files, sub_tile_slices, task, timer, num_threads,
+                                                      dtype=dtype)
+            else:
+                for sub_tile_slice in sub_tile_slices:
+                    process_chunk(output_files, sub_tile_slice, task, timer, dtype=dtype)
     except OutputFileAlreadyExists as e:
         _LOG.warning(str(e))
     except OutputDriverResult as e:
@@ -517,15 +645,32 @@ def execute_task(task: StatsTask, output_driver, chunking) -> StatsTask:
         raise StatsProcessingException("Error processing task: %s" % task)
 
     timer.pause('total')
-    _LOG.debug('Completed %s %s task with %s data sources; %s', task.spatial_id,
-               [d.strftime('%Y-%m-%d') for d in task.time_period], task.data_sources_length(), timer)
+    if _LOG.isEnabledFor(logging.DEBUG):
+        # one JSON object per task, for downstream tooling to parse
+        _LOG.debug('Completed task: %s', json.dumps({'spatial_id': task.spatial_id,
+                                                     'time_period': [d.strftime('%Y-%m-%d')
+                                                                     for d in task.time_period],
+                                                     'data_sources': task.data_sources_length(),
+                                                     'run_times': timer.run_times,
+                                                     'max_rss': timer.max_rss},
+                                                    sort_keys=True, default=str))
     return task
 
 
+def _warmup_statistics(task: StatsTask):
+    """
+    Warm up the statistics of `task`, so that kernel compilation happens before any chunks are computed
+    concurrently. Kernels already warmed up by this process are skipped, see `stat_funcs._warmup`.
+    """
+    for stat in task.output_products.values():
+        stat.statistic.warmup()
+
+
 def load_process_save_chunk_iteratively(output_files: OutputDriver,
                                         chunk: Tuple[slice, slice, slice],
                                         task: StatsTask,
-                                        timer: MultiTimer):
+                                        timer: MultiTimer,
+                                        dtype='float32'):
     procs = [(stat.make_iterative_proc(), name, stat) for name, stat in task.output_products.items()]
 
     def update(ds):
@@ -538,7 +683,7 @@ def load_process_save_chunk_iteratively(output_files: OutputDriver,
             output_files.write_data(name, var_name, chunk, var.values)
 
     geom = geometry_for_task(task)
-    for ds in load_data_lazy(chunk, task.sources, geom=geom, timer=timer):
+    for ds in load_data_lazy(chunk, task.sources, geom=geom, timer=timer, dtype=dtype):
         update(ds)
 
     with timer.time('writing_data'):
@@ -556,18 +701,75 @@ def geometry_for_task(task: StatsTask):
 
 def load_process_save_chunk(output_files: OutputDriver,
                             chunk: Tuple[slice, slice, slice],
-                            task: StatsTask, timer: MultiTimer):
+                            task: StatsTask, timer: MultiTimer, dtype='float32'):
+    results = load_process_chunk(chunk, task, timer, dtype=dtype)
+
+    # For each of the data variables, shove this chunk into the output results
+    with timer.time('writing_data'):
+        for prod_name, result in results:
+            output_files.write_chunk(prod_name, chunk, result)
+
+
+def load_process_save_chunks_concurrently(output_files: OutputDriver,
+                                          chunks: Iterable[Tuple[slice, slice, slice]],
+                                          task: StatsTask, timer: MultiTimer, num_threads: int,
+                                          dtype='float32'):
+    """
+    Load and compute `chunks` on a pool of `num_threads` threads.
+
+    Results are written from the calling thread in the order of `chunks`, since output files
+    can not be written to concurrently. At most `num_threads` chunks are in flight at once.
+    """
+    def process(chunk):
+        chunk_timer = MultiTimer()
+        return load_process_chunk(chunk, task, chunk_timer, dtype=dtype), chunk_timer
+
+    def save(chunk, future):
+        try:
+            results, chunk_timer = future.result()
+        except Exception:
+            _LOG.error('Error processing chunk %s of task %s',
+                       "({})".format(", ".join(prettier_slice(c) for c in chunk)), task)
+            raise
+
+        timer.merge(chunk_timer)
+        with timer.time('writing_data'):
+            for prod_name, result in results:
+                output_files.write_chunk(prod_name, chunk, result)
+
+    # (chunk, future) pairs, so that each result is known to belong to its chunk
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        for chunk in chunks:
+            if len(pending) >= num_threads:
+                save(*pending.popleft())
+            pending.append((chunk, executor.submit(process, chunk)))
+
+        while pending:
+            save(*pending.popleft())
+
+
+def load_process_chunk(chunk: Tuple[slice, slice, slice],
+                       task: StatsTask, timer: MultiTimer,
+                       dtype='float32') -> List[Tuple[str, xarray.Dataset]]:
+    """
+    Load a chunk of data and compute all the output products of `task` on it.
+
+    :return: list of (product name, result) pairs, empty if no data was found for the chunk
+    """
+    results = []
     try:
         with timer.time('loading_data'):
             geom = geometry_for_task(task)
-            data = load_data(chunk, task.sources, geom=geom)
+            data = load_data(chunk, task.sources, geom=geom, time_orders=task.get('time_orders'), dtype=dtype)
 
         last_idx = len(task.output_products) - 1
         for idx, (prod_name, stat) in enumerate(task.output_products.items()):
-            _LOG.debug("Computing %s in tile %s %s; %s",
-                       prod_name, task.spatial_id,
-                       "({})".format(", ".join(prettier_slice(c) for c in chunk)),
-                       timer)
+            if _LOG.isEnabledFor(logging.DEBUG):
+                _LOG.debug("Computing %s in tile %s %s; %s",
+                           prod_name, task.spatial_id,
+                           "({})".format(", ".join(prettier_slice(c) for c in chunk)),
+                           timer)
 
             measurements = stat.data_measurements
 
@@ -578,27 +780,26 @@ def load_process_save_chunk(output_files: OutputDriver,
                     del data
 
                 # restore nodata values back
-                result = cast_back(result, measurements)
-
-            # For each of the data variables, shove this chunk into the output results
-            with timer.time('writing_data'):
-                output_files.write_chunk(prod_name, chunk, result)
+                results.append((prod_name, cast_back(result, measurements)))
 
     except EmptyChunkException:
         _LOG.debug('Error: No data returned while loading %s for %s. May have all been masked',
                    chunk, task)
 
+    return results
+
 
 class EmptyChunkException(Exception):
     pass
 
 
-def load_data_lazy(sub_tile_slice, sources, geom=None, reverse=False, timer=None):
+def load_data_lazy(sub_tile_slice, sources, geom=None, reverse=False, timer=None, dtype='float32'):
     def by_time(ds):
         return ds.time.values[0]
 
     data = [load_masked_data_lazy(sub_tile_slice, source,
-                                  reverse=reverse, geom=geom, src_idx=source.source_index, timer=timer)
+                                  reverse=reverse, geom=geom, src_idx=source.source_index, timer=timer,
+                                  dtype=dtype)
             for source in sources]
 
     if len(data) == 1:
@@ -608,18 +809,23 @@ def load_data_lazy(sub_tile_slice, sources, geom=None, reverse=False, timer=None
 
 
 def load_data(sub_tile_slice: Tuple[slice, slice, slice],
-              sources: Iterable[DataSource], geom=None) -> xarray.Dataset:
+              sources: Iterable[DataSource], geom=None, time_orders=None, dtype='float32') -> xarray.Dataset:
     """
     Load a masked chunk of data from the datacube, based on a specification and list of datasets in `sources`.
 
     :param sub_tile_slice: A portion of a tile, tuple coordinates
     :param sources: a dictionary containing `data`, `spec` and `masks`
     :param geom: polygon feature to mask by
+    :param time_orders: optional dict caching the time sorting permutation across chunks of the same `sources`
+    :param dtype: floating point type integer data is converted to when masking `nodata`
     :return: :class:`xarray.Dataset` containing loaded data. Will be indexed and sorted by time.
     """
-    datasets = [load_masked_data(sub_tile_slice, source_prod, geom=geom)
+    datasets = [load_masked_data(sub_tile_slice, source_prod, geom=geom, dtype=dtype)
                 for source_prod in sources]  # list of datasets
 
+    # every chunk of a source has the same observation times, the ordering only depends on which are present
+    present = tuple(idx for idx, dataset in enumerate(datasets) if dataset is not None)
+
     datasets = _remove_emptys(datasets)
     if len(datasets) == 0:
         raise EmptyChunkException()
@@ -627,11 +833,22 @@ def load_data(sub_tile_slice: Tuple[slice, slice, slice],
     # TODO: Add check for compatible data variable attributes
     # flags_definition between pq products is different and is silently dropped
     ds = xarray.concat(datasets, dim='time')  # Copies all the data
+    del datasets  # release the per-source copies before sorting
     if len(ds.time) == 0:
         raise EmptyChunkException()
 
+    if time_orders is None:
+        time_orders = {}
+    order = time_orders.get(present)
+    if order is None or len(order) != len(ds.time):
+        order = time_orders[present] = np.argsort(ds.time.values, kind='stable')
+
+    # each source is loaded sorted by time, so there is nothing to do unless they interleave
+    if np.all(order[1:] > order[:-1]):
+        return ds
+
     # sort along time dim
-    return ds.sortby('time')  # Copies all the data again
+    return ds.isel(time=order)  # Copies all the data again
 
 
 def _remove_emptys(datasets):
@@ -648,6 +865,7 @@ def load_masked_tile_lazy(tile, masks,
                           inverts=None,
                           src_idx=None,
                           timer=None,
+                          dtype='float32',
                           **kwargs):
     """Given data tile and an optional list of masks load data and masks apply
     masks to data and return one time slice at a time.
@@ -659,13 +877,14 @@ def load_masked_tile_lazy(tile, masks,
              flags -- dictionary of flags to be checked
              load_args - dictionary of load parameters (e.g. fuse_func, measurements, etc.)
 
-    mask_nodata  -- Convert data to float32 replacing nodata values with nan
+    mask_nodata  -- Convert data to `dtype` replacing nodata values with nan
     mask_inplace -- Apply mask without conversion to float
     reverse      -- Return data earliest observation first
     geom         -- polygon feature to mask by
     inverts      -- Whether or not to invert the corresponding mask
     src_idx      -- If set adds extra axis called source with supplied value
     timer        -- Optionally track time
+    dtype        -- Floating point type to convert integer data to when masking nodata
 
 
     Returns an iterator of DataFrames one time-slice at a time
@@ -681,7 +900,7 @@ def load_masked_tile_lazy(tile, masks,
         d = GridWorkflow.load(tile[loc], **kwargs)
 
         if mask_nodata:
-            d = sensible_mask_invalid_data(d)
+            d = sensible_mask_invalid_data(d, dtype=dtype)
 
         # Load all masks and combine them all into one
         mask = None
@@ -727,7 +946,8 @@ def load_masked_tile_lazy(tile, masks,
 
 def load_masked_data_lazy(sub_tile_slice: Tuple[slice, slice, slice],
                           source_prod: DataSource,
-                          geom=None, reverse=False, src_idx=None, timer=None) -> xarray.Dataset:
+                          geom=None, reverse=False, src_idx=None, timer=None,
+                          dtype='float32') -> xarray.Dataset:
     data_fuse_func = import_function(source_prod.spec['fuse_func']) if 'fuse_func' in source_prod.spec else None
     data_tile = source_prod.data[sub_tile_slice]
     data_measurements = source_prod.spec.get('measurements')
@@ -756,6 +976,7 @@ def load_masked_data_lazy(sub_tile_slice: Tuple[slice, slice, slice],
                                  inverts=inverts,
                                  src_idx=src_idx,
                                  timer=timer,
+                                 dtype=dtype,
                                  geom=geom,
                                  fuse_func=data_fuse_func,
                                  measurements=data_measurements,
@@ -779,22 +1000,47 @@ def make_mask_from_spec(loaded_mask_data, mask_spec):
 
 
 def load_masked_data(sub_tile_slice: Tuple[slice, slice, slice],
-                     source_prod: DataSource, geom=None) -> xarray.Dataset:
-    data_fuse_func = import_function(source_prod.spec['fuse_func']) if 'fuse_func' in source_prod.spec else None
-    data = GridWorkflow.load(source_prod.data[sub_tile_slice],
-                             measurements=source_prod.spec.get('measurements'),
-                             fuse_func=data_fuse_func,
-                             skip_broken_datasets=True)
+                     source_prod: DataSource, geom=None, dtype='float32') -> xarray.Dataset:
+    # Load all masks first and combine them all into one, so that fully masked chunks are never loaded
+    mask = None
+    if 'masks' in source_prod.spec:
+        for mask_spec, mask_tile in zip(source_prod.spec['masks'], source_prod.masks):
+            if mask_tile is None:
+                # Discard data due to no mask data
+                return None
+            mask_fuse_func = import_function(mask_spec['fuse_func']) if 'fuse_func' in mask_spec else None
+            loaded_mask = GridWorkflow.load(mask_tile[sub_tile_slice],
+                                            measurements=[mask_spec['measurement']],
+                                            fuse_func=mask_fuse_func,
+                                            skip_broken_datasets=True)[mask_spec['measurement']]
+
+            if mask is None:
+                mask = make_mask_from_spec(loaded_mask, mask_spec)
+            else:
+                mask = mask & make_mask_from_spec(loaded_mask, mask_spec)
+            del loaded_mask
+
+    fully_masked = mask is not None and not mask.any().item()
+
+    if fully_masked:
+        # everything is masked out, so there is no need to read the data
+        data = _nodata_like_tile(source_prod.data[sub_tile_slice], source_prod.spec.get('measurements'))
+    else:
+        data_fuse_func = import_function(source_prod.spec['fuse_func']) if 'fuse_func' in source_prod.spec else None
+        data = GridWorkflow.load(source_prod.data[sub_tile_slice],
+                                 measurements=source_prod.spec.get('measurements'),
+                                 fuse_func=data_fuse_func,
+                                 skip_broken_datasets=True)
 
     mask_inplace = source_prod.spec.get('mask_inplace', False)
     mask_nodata = source_prod.spec.get('mask_nodata', True)
 
     if mask_nodata:
-        data = sensible_mask_invalid_data(data)
+        data = sensible_mask_invalid_data(data, dtype=dtype)
 
     # if all NaN
     completely_empty = all(ds for ds in xarray.ufuncs.isnan(data).all().data_vars.values())
-    if completely_empty:
+    if completely_empty and not fully_masked:
         # Discard empty slice
         return None
 
@@ -803,19 +1049,9 @@ def load_masked_data(sub_tile_slice: Tuple[slice, slice, slice],
     else:
         where = sensible_where
 
-    if 'masks' in source_prod.spec:
-        for mask_spec, mask_tile in zip(source_prod.spec['masks'], source_prod.masks):
-            if mask_tile is None:
-                # Discard data due to no mask data
-                return None
-            mask_fuse_func = import_function(mask_spec['fuse_func']) if 'fuse_func' in mask_spec else None
-            mask = GridWorkflow.load(mask_tile[sub_tile_slice],
-                                     measurements=[mask_spec['measurement']],
-                                     fuse_func=mask_fuse_func,
-                                     skip_broken_datasets=True)[mask_spec['measurement']]
-
-            data = where(data, make_mask_from_spec(mask, mask_spec))
-            del mask
+    if mask is not None:
+        data = where(data, mask)
+        del mask
 
     if geom is not None:
         data = where(data, geometry_mask([geom], data.geobox, invert=True))
@@ -826,35 +1062,71 @@ def load_masked_data(sub_tile_slice: Tuple[slice, slice, slice],
     return data
 
 
-def _source_measurement_defs(index, sources):
+def _nodata_like_tile(tile, measurements=None):
+    """
+    A :class:`xarray.Dataset` of `measurements` filled with `nodata`, with the same shape, types and
+    coordinates as loading `tile` would return.
+    """
+    measurement_dicts = tile.product.lookup_measurements(measurements)
+    return datacube.Datacube.create_storage(tile.sources.coords, tile.geobox, list(measurement_dicts.values()))
+
+
+def _measurements_signature(source):
+    """Hashable form of the measurements requested from a source, `None` for all of them."""
+    measurements = source.get('measurements')
+    return None if measurements is None else tuple(measurements)
+
+
+def _get_product(index, name, products=None):
+    """
+    Look up a product by name in the database index, at most once per name when `products` is
+    a dictionary to cache the result in.
+    """
+    if products is None:
+        return index.products.get_by_name(name)
+    if name not in products:
+        products[name] = index.products.get_by_name(name)
+    return products[name]
+
+
+def _source_measurement_defs(index, sources, products=None):
     """
 
     Look up desired measurements from sources in the database index. Note that
     multiple sources are meant to be of the same shape, we only support
     combining equivalent products from different sensors.
 
+    :param products: optional dictionary caching product lookups by name
     :return: list of measurement definitions
     """
     # Check all source measurements are equal
     first_source = sources[0]
 
     # Ensure specified sources match
-    for other_source in sources[1:]:
-        if other_source.get('measurements') != first_source.get('measurements'):
-            raise StatsConfigurationError('Measurements in configured sources do not match. To combine sources'
-                                          'they must all be identical. %s measurements are %s while %s measurements '
-                                          'are %s' % (first_source['product'], first_source['measurements'],
-                                                      other_source['product'], other_source['measurements']))
+    signatures = {_measurements_signature(source) for source in sources}
+    if len(signatures) > 1:
+        other_source = next(source for source in sources[1:]
+                            if _measurements_signature(source) != _measurements_signature(first_source))
+        raise StatsConfigurationError('Measurements in configured sources do not match. To combine sources '
+                                      'they must all be identical. %s measurements are %s while %s measurements '
+                                      'are %s' % (first_source['product'], first_source.get('measurements'),
+                                                  other_source['product'], other_source.get('measurements')))
 
     # TODO: should probably check that all products exist and are of compatible shape
 
-    available_measurements = index.products.get_by_name(first_source['product']).measurements
+    product = _get_product(index, first_source['product'], products)
+    if product is None:
+        raise StatsConfigurationError('Source product %s was not found in the index' % first_source['product'])
+
+    available_measurements = product.measurements
     requested_measurements = first_source.get('measurements', available_measurements.keys())
 
-    try:
-        return [available_measurements[name] for name in requested_measurements]
-    except KeyError:
-        raise StatsConfigurationError('Some of the requested measurements were not present in the product definition')
+    missing = [name for name in requested_measurements if name not in available_measurements]
+    if missing:
+        raise StatsConfigurationError('Some of the requested measurements were not present in the product '
+                                      'definition of %s: %s' % (first_source['product'], ', '.join(missing)))
+
+    return [available_measurements[name] for name in requested_measurements]
 
 
 def _get_app_metadata(config_file):
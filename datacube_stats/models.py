@@ -41,6 +41,10 @@ class StatsTask:
 
         self.is_iterative = False
 
+        #: Permutations sorting loaded observations by time, keyed by the sources present in a chunk.
+        #: Shared by all chunks of the task, see `load_data`
+        self.time_orders = {}
+
     @property
     def geobox(self) -> GeoBox:
         return self.sources[0].data.geobox
@@ -53,6 +57,15 @@ class StatsTask:
     def time_attributes(self):
         return self.sources[0].data.sources.time.attrs
 
+    def key(self):
+        """
+        Hashable identity of the outputs of this task. Tasks with equal keys cover the same place and time,
+        and would write the same output files.
+        """
+        # features without an id share a `spatial_id`, so tell them apart by their polygon too
+        feature = None if self.feature is None else (self.feature.id, self.feature.geopolygon.wkt)
+        return tuple(sorted(self.spatial_id.items())), tuple(self.time_period), feature
+
     def data_sources_length(self) -> int:
         return sum(len(d.data.sources) for d in self.sources)
 
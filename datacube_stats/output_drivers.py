@@ -3,12 +3,12 @@ Provide some classes for writing data out to files on disk.
 """
 import abc
 import logging
-import operator
 import subprocess
 import tempfile
+import threading
 import pydash
 from collections import OrderedDict
-from functools import reduce as reduce_
+from itertools import chain
 from pathlib import Path
 from typing import Iterable, Tuple, List
 
@@ -24,6 +24,14 @@ from datacube.drivers.netcdf import (
     create_netcdf_storage_unit)
 from six import with_metaclass
 
+try:
+    # taken by datacube around every read of NetCDF/HDF5 data
+    from datacube.storage._hdf5 import HDF5_LOCK
+    _SHARES_HDF5_LOCK = True
+except ImportError:
+    HDF5_LOCK = threading.RLock()
+    _SHARES_HDF5_LOCK = False
+
 from .models import OutputProduct
 from .utils import prettier_slice
 
@@ -143,6 +151,9 @@ class OutputDriver(with_metaclass(RegisterDriver)):
     """
     valid_extensions: List[str] = []
 
+    #: Whether data may be loaded on other threads while this driver writes, see `execute_task`
+    allows_concurrent_loading = True
+
     def __init__(self, task, storage, output_path, app_info=None, global_attributes=None, var_attributes=None):
         self._storage = storage
 
@@ -279,9 +290,6 @@ class OutputDriver(with_metaclass(RegisterDriver)):
         geobox = self._task.geobox
         app_info = self._app_info
 
-        def add_all(iterable):
-            return reduce_(operator.add, iterable)
-
         def merge_sources(prod):
             # Merge data sources and mask sources
             # Align the data `Tile` with potentially many mask `Tile`s along their time axis
@@ -291,14 +299,14 @@ class OutputDriver(with_metaclass(RegisterDriver)):
             # TODO: The following can fail if prod.data and prod.masks have different times
             # Which can happen in the case of a missing PQ Scene, where there is a scene overlap
             # ie. Two overlapped NBAR scenes, One PQ scene (the later)
-            return add_all(sources_.sum() for sources_ in all_sources)
-
-        sources = add_all(merge_sources(prod) for prod in task.sources)
+            return chain.from_iterable(dataset_tuple
+                                       for sources_ in all_sources
+                                       for dataset_tuple in sources_.values.ravel())
 
-        def unique(index, dataset_tuple):
-            return tuple(set(dataset_tuple))
-
-        sources = xr_apply(sources, unique, dtype='O')
+        # Flatten every source tuple in a single pass, rather than summing the tuples pairwise
+        merged = numpy.empty((), dtype='O')
+        merged[()] = tuple(set(chain.from_iterable(merge_sources(prod) for prod in task.sources)))
+        sources = xarray.DataArray(merged)
 
         # Sources has no time at this point, so insert back in the start of our stats epoch
         start_time, _ = task.time_period
@@ -333,6 +341,9 @@ class NetCDFCFOutputDriver(OutputDriver):
 
     valid_extensions = ['.nc']
 
+    #: The HDF5 library is not thread safe, so writes must hold the same lock as datacube's reads
+    allows_concurrent_loading = _SHARES_HDF5_LOCK
+
     @classmethod
     def format_name(cls):
         return 'NetCDF'
@@ -371,15 +382,14 @@ class NetCDFCFOutputDriver(OutputDriver):
         chunking = self._storage['chunking']
         chunking = [chunking[dim] for dim in self._storage['dimension_order']]
 
+        # parameters shared by every measurement of the product
+        base_params = dict(stat.output_params or {}, chunksizes=chunking)
+
         variable_params = {}
         for measurement in stat.data_measurements:
             name = measurement['name']
 
-            if stat.output_params is None:
-                v_params = {}
-            else:
-                v_params = stat.output_params.copy()
-            v_params['chunksizes'] = chunking
+            v_params = dict(base_params)
             v_params.update(
                 {k: v for k, v in measurement.items() if k in _NETCDF_VARIABLE__PARAMETER_NAMES})
 
@@ -405,11 +415,12 @@ class NetCDFCFOutputDriver(OutputDriver):
                                           global_attributes=self.global_attributes)
 
     def write_data(self, prod_name, measurement_name, chunk, values):
-        self._output_file_handles[prod_name][measurement_name][(0,) + chunk[1:]] = netcdf_writer.netcdfy_data(
-            values)
-        self._output_file_handles[prod_name].sync()
-        _LOG.debug("Updated %s %s", measurement_name,
-                   "({})".format(", ".join(prettier_slice(x) for x in chunk[1:])))
+        with HDF5_LOCK:
+            self._output_file_handles[prod_name][measurement_name][(0,) + chunk[1:]] = netcdf_writer.netcdfy_data(
+                values)
+        if _LOG.isEnabledFor(logging.DEBUG):
+            _LOG.debug("Updated %s %s", measurement_name,
+                       "({})".format(", ".join(prettier_slice(x) for x in chunk[1:])))
 
     def write_global_attributes(self, attributes):
         for output_file in self._output_file_handles.values():
@@ -576,8 +587,9 @@ class GeoTiffOutputDriver(OutputDriver):
 
         t, y, x = chunk
         window = ((y.start, y.stop), (x.start, x.stop))
-        _LOG.debug("Updating %s.%s %s", prod_name, measurement_name,
-                   "({})".format(", ".join(prettier_slice(x) for x in chunk[1:])))
+        if _LOG.isEnabledFor(logging.DEBUG):
+            _LOG.debug("Updating %s.%s %s", prod_name, measurement_name,
+                       "({})".format(", ".join(prettier_slice(x) for x in chunk[1:])))
 
         dtype = self._get_dtype(prod_name, measurement_name)
 
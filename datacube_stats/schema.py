@@ -2,7 +2,7 @@ from string import Formatter
 import datetime
 
 import pandas as pd
-from voluptuous import Schema, Required, All, Length, Date, ALLOW_EXTRA, Optional, Any, In, Invalid, Inclusive
+from voluptuous import Schema, Required, All, Length, Date, ALLOW_EXTRA, Optional, Any, In, Invalid, Inclusive, Range
 
 from .statistics import STATS
 from .output_drivers import OUTPUT_DRIVERS
@@ -120,7 +120,10 @@ stats_schema = Schema({
     'sources': All([source_schema], Length(min=1)),
     'storage': storage_schema,
     'output_products': All([output_product_schema], Length(min=1)),
-    Optional('computation'): {'chunking': computation_schema},
+    Optional('computation'): {'chunking': computation_schema,
+                              Optional('num_threads'): All(int, Range(min=1)),
+                              Optional('max_concurrent_queries'): All(int, Range(min=1)),
+                              Optional('dtype'): Any('float32', 'float64')},
     Optional('input_region'): Any(single_tile, tile_list, from_file, geometry, boundary_coords),
     Optional('global_attributes'): dict,
     Optional('var_attributes'): {str: {str: str}},
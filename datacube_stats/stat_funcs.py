@@ -6,6 +6,7 @@ from functools import reduce as reduce_
 from operator import mul as mul_op
 
 import numpy as np
+import xarray
 
 try:
     from bottleneck import anynan, nansum
@@ -15,6 +16,37 @@ except ImportError:
     def anynan(x, axis=None):
         return np.isnan(x).any(axis=axis)
 
+try:
+    from numba import njit, prange, typeof, threading_layer
+except ImportError:
+    njit = None
+
+# `fastmath` without the 'nnan' flag, the kernels rely on `np.isnan` to skip invalid observations
+_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+
+def _pairwise_distances(x):
+    """
+    Euclidean distances between the rows of (a stack of) matrices.
+
+    Uses ``|a - b|^2 = |a|^2 + |b|^2 - 2 <a, b>`` so that the bulk of the work is
+    a single (batched) matrix product instead of the broadcast differences.
+    Rows containing NaNs give NaN distances, as the direct computation does.
+
+    :param x: array of shape (..., n, d)
+    :return: array of shape (..., n, n)
+    """
+    # float64 to limit the cancellation error of the expansion
+    x = np.asarray(x, dtype=np.float64)
+    sq_norm = np.einsum('...ij,...ij->...i', x, x)
+    dist = np.matmul(x, np.swapaxes(x, -1, -2))
+    dist *= -2
+    dist += sq_norm[..., :, np.newaxis]
+    dist += sq_norm[..., np.newaxis, :]
+    # rounding can leave tiny negative values, NaNs are propagated
+    np.maximum(dist, 0, out=dist)
+    return np.sqrt(dist, out=dist)
+
 
 def argnanmedoid(x, axis=1):
     """
@@ -28,9 +60,7 @@ def argnanmedoid(x, axis=1):
         x = x.T
 
     invalid = anynan(x, axis=0)
-    band, time = x.shape
-    diff = x.reshape(band, time, 1) - x.reshape(band, 1, time)
-    dist = np.sqrt(np.sum(diff * diff, axis=0))  # dist = np.linalg.norm(diff, axis=0) is slower somehow...
+    dist = _pairwise_distances(x.T)
     dist_sum = nansum(dist, axis=0)
     dist_sum[invalid] = np.inf
     i = np.argmin(dist_sum)
@@ -46,13 +76,9 @@ def medoid_indices(arr, invalid=None):
     :arg invalid: mask for invalid data containing NaNs
     """
     # vectorized version of `argnanmedoid`
-    bands, times, ys, xs = arr.shape
-
-    diff = (arr.reshape(bands, times, 1, ys, xs) -
-            arr.reshape(bands, 1, times, ys, xs))
-
-    dist = np.linalg.norm(diff, axis=0)
-    dist_sum = nansum(dist, axis=0)
+    # one (time, time) distance matrix per pixel, computed as a batched matrix product
+    dist = _pairwise_distances(arr.transpose(2, 3, 1, 0))
+    dist_sum = nansum(dist, axis=-1).transpose(2, 0, 1)
 
     if invalid is None:
         # compute it in case it's not already available
@@ -126,6 +152,21 @@ def argpercentile(a, q, axis=0):
     return axisindex(np.argsort(a, axis=axis), index, axis=axis)
 
 
+def argpercentiles(a, qs, axis=0):
+    """
+    Compute the indices of several percentiles of the data along the specified axis.
+
+    Equivalent to calling :func:`argpercentile` for each `q` in `qs`, but `a` is only sorted once.
+
+    :return: list of index arrays, one per percentile
+    """
+    order = np.argsort(a, axis=axis)
+    valid = a.shape[axis] - 1 - np.isnan(a).sum(axis=axis)
+    # NOTE: assuming nans are gonna sort larger than everything else
+    return [axisindex(order, np.round(q / 100.0 * valid).astype(np.int32), axis=axis)
+            for q in qs]
+
+
 def nan_percentile(arr, q, axis=0):
     """
     Return requested percentile(s) of a 3D array, ignoring NaNs
@@ -184,11 +225,242 @@ def nan_percentile(arr, q, axis=0):
         return result
 
 
+if njit is not None:
+    @njit(parallel=True, nogil=True, fastmath=_FASTMATH, cache=True)
+    def _argnanmedoid_kernel(arr):
+        """
+        Per-pixel equivalent of `argnanmedoid`.
+
+        :param arr: array of shape (y, x, time, band)
+        :return: (y, x) array of the indices of the medoid along time
+        """
+        ys, xs, times, bands = arr.shape
+        index = np.zeros((ys, xs), dtype=np.int64)
+
+        for iy in prange(ys):  # pylint: disable=not-an-iterable
+            invalid = np.empty(times, dtype=np.bool_)
+            for ix in range(xs):
+                for i in range(times):
+                    invalid[i] = False
+                    for v in range(bands):
+                        if np.isnan(arr[iy, ix, i, v]):
+                            invalid[i] = True
+                            break
+
+                best, best_sum = 0, np.inf
+                for i in range(times):
+                    if invalid[i]:
+                        continue
+                    dist_sum = 0.0
+                    for j in range(times):
+                        if invalid[j]:
+                            continue
+                        dist = 0.0
+                        for v in range(bands):
+                            diff = arr[iy, ix, i, v] - arr[iy, ix, j, v]
+                            dist += diff * diff
+                        dist_sum += np.sqrt(dist)
+                    if dist_sum < best_sum:
+                        best, best_sum = i, dist_sum
+
+                index[iy, ix] = best
+
+        return index
+else:
+    _argnanmedoid_kernel = None
+
+
+#: reductions computed by `nd_min_mean_max`, in the order it returns them
+ND_FUSED_STATS = ('min', 'mean', 'max')
+
+if njit is not None:
+    @njit(parallel=True, nogil=True, fastmath=_FASTMATH, error_model='numpy', cache=True)
+    def _nd_min_mean_max_kernel(band1, band2, out_min, out_mean, out_max):
+        ys, xs, times = band1.shape
+
+        for iy in prange(ys):  # pylint: disable=not-an-iterable
+            for ix in range(xs):
+                lowest, highest, total, count = np.inf, -np.inf, 0.0, 0
+                for t in range(times):
+                    a = np.float64(band1[iy, ix, t])
+                    b = np.float64(band2[iy, ix, t])
+                    nd = (a - b) / (a + b)
+                    if np.isnan(nd):
+                        continue
+                    lowest = min(lowest, nd)
+                    highest = max(highest, nd)
+                    total += nd
+                    count += 1
+
+                if count == 0:
+                    out_min[iy, ix] = out_mean[iy, ix] = out_max[iy, ix] = np.nan
+                else:
+                    out_min[iy, ix] = lowest
+                    out_mean[iy, ix] = total / count
+                    out_max[iy, ix] = highest
+
+    def _nd_min_mean_max_args(band1, band2):
+        # `apply_ufunc` moves `time` last, leaving transposed views, so copy the bands to always
+        # call the kernel with (and warm it up for) contiguous arrays, and read each pixel contiguously
+        band1, band2 = np.ascontiguousarray(band1), np.ascontiguousarray(band2)
+        dtype = np.result_type(band1.dtype, band2.dtype, np.float32)
+        return (band1, band2) + tuple(np.empty(band1.shape[:-1], dtype=dtype) for _ in ND_FUSED_STATS)
+
+    def nd_min_mean_max(band1, band2):
+        """
+        Min, mean and max through time of `(band1 - band2) / (band1 + band2)`, ignoring NaNs,
+        without materializing the normalised difference.
+
+        :param band1, band2: arrays of shape (y, x, time)
+        :return: tuple of (min, mean, max) arrays of shape (y, x)
+        """
+        args = _nd_min_mean_max_args(band1, band2)
+        _nd_min_mean_max_kernel(*args)
+        return args[2:]
+else:
+    nd_min_mean_max = None
+
+
+if njit is not None:
+    @njit(parallel=True, nogil=True, cache=True)
+    def _wofs_counts_kernel(water, wet, dry):
+        ys, xs, times = water.shape
+
+        for iy in prange(ys):  # pylint: disable=not-an-iterable
+            for ix in range(xs):
+                wet_count, dry_count = 0, 0
+                for t in range(times):
+                    value = water[iy, ix, t]
+                    if value == 128 or value == 132:
+                        wet_count += 1
+                    elif value == 0 or value == 4:
+                        dry_count += 1
+                wet[iy, ix] = wet_count
+                dry[iy, ix] = dry_count
+
+    def _wofs_counts_args(water):
+        # contiguous for the same reasons as `_nd_min_mean_max_args`
+        water = np.ascontiguousarray(water)
+        return (water,
+                np.empty(water.shape[:-1], dtype=np.int64),
+                np.empty(water.shape[:-1], dtype=np.int64))
+
+    def wofs_counts(water):
+        """
+        Count wet (128 or 132) and dry (0 or 4) observations through time in one pass.
+
+        :param water: integer array of shape (y, x, time)
+        :return: tuple of (wet, dry) count arrays of shape (y, x)
+        """
+        args = _wofs_counts_args(water)
+        _wofs_counts_kernel(*args)
+        return args[1:]
+else:
+    wofs_counts = None
+
+
+def kernels_threadsafe():
+    """
+    Whether the `numba` kernels can be called from several threads at once. The 'workqueue' threading layer,
+    used when neither TBB nor OpenMP are installed, aborts the process when parallel kernels run concurrently.
+    """
+    if njit is None:
+        return True
+    try:
+        return threading_layer() != 'workqueue'
+    except ValueError:
+        # no parallel kernel has run yet, so none was warmed up by the statistics
+        return True
+
+
+#: (kernel, argument types) already compiled, or loaded from the cache, by this process, see `_warmup`
+_WARMED_UP_KERNELS = set()
+
+
+def _warmup(kernel, *args):
+    """
+    Call `kernel` on `args` the first time its signature is seen by this process, so that compilation happens
+    once per worker, before any chunks are computed concurrently.
+    """
+    key = (kernel, tuple(typeof(arg) for arg in args))
+    if key not in _WARMED_UP_KERNELS:
+        kernel(*args)
+        _WARMED_UP_KERNELS.add(key)
+
+
+def warmup_medoid(dtype=np.float32):
+    """Compile (or load from the cache) the `numba` medoid kernel for `dtype`, if available."""
+    if _argnanmedoid_kernel is not None:
+        _warmup(_argnanmedoid_kernel, np.zeros((1, 1, 2, 2), dtype=dtype))
+
+
+def warmup_nd(dtype=np.float32):
+    """Compile (or load from the cache) the `numba` normalised difference kernel for `dtype`, if available."""
+    if nd_min_mean_max is not None:
+        band = np.ones((1, 1, 2), dtype=dtype)
+        _warmup(_nd_min_mean_max_kernel, *_nd_min_mean_max_args(band, band))
+
+
+def warmup_wofs(dtype=np.uint8):
+    """Compile (or load from the cache) the `numba` WOfS counting kernel for `dtype`, if available."""
+    if wofs_counts is not None:
+        _warmup(_wofs_counts_kernel, *_wofs_counts_args(np.zeros((1, 1, 2), dtype=dtype)))
+
+
+def _medoid_index(arr, index_dtype):
+    # core dimensions (time, variable) are last, so the kernel reads each pixel contiguously
+    return _argnanmedoid_kernel(np.ascontiguousarray(arr)).astype(index_dtype)
+
+
+def medoid_index_array(flattened, index_dtype='int16'):
+    """
+    Indices of the medoid through time, using the `numba` kernel through :func:`xarray.apply_ufunc`,
+    so that dask backed data is processed block by block.
+
+    :param xarray.DataArray flattened: data with `variable` and `time` dimensions
+    :return: :class:`xarray.DataArray` of indices, without the `variable` and `time` dimensions
+    """
+    assert _argnanmedoid_kernel is not None, 'requires numba'
+    if flattened.chunks is not None:
+        # each block needs every observation of its pixels
+        flattened = flattened.chunk({'time': -1, 'variable': -1})
+    return xarray.apply_ufunc(_medoid_index, flattened,
+                              input_core_dims=[['time', 'variable']],
+                              kwargs={'index_dtype': index_dtype},
+                              dask='parallelized',
+                              output_dtypes=[index_dtype])
+
+
+def _stack_pixels(data):
+    """
+    Stack the variables of `data` into a single contiguous (y, x, time, variable) array, so that all
+    the observations of a pixel are adjacent in memory. Only one copy of the data is made.
+
+    The spatial dimensions are kept in their order, whatever they are named (eg. `latitude`, `longitude`).
+    """
+    variables = list(data.data_vars.values())
+    dims = ('time',) + tuple(dim for dim in variables[0].dims if dim != 'time')
+    time, y, x = (data.sizes[dim] for dim in dims)
+    stacked = np.empty((y, x, time, len(variables)),
+                       dtype=np.result_type(*[var.dtype for var in variables]))
+    for i, var in enumerate(variables):
+        stacked[..., i] = var.transpose(*dims).values.transpose(1, 2, 0)
+    return stacked
+
+
 def _compute_medoid(data, index_dtype='int16'):
-    flattened = data.to_array(dim='variable')
-    variable, time, y, x = flattened.shape
-    index = np.empty((y, x), dtype=index_dtype)
-    for iy in range(y):
-        for ix in range(x):
-            index[iy, ix] = argnanmedoid(flattened.values[:, :, iy, ix])
-    return index
+    if _argnanmedoid_kernel is None:
+        # fallback without `numba`
+        flattened = data.to_array(dim='variable')
+        variable, time, y, x = flattened.shape
+        index = np.empty((y, x), dtype=index_dtype)
+        for iy in range(y):
+            for ix in range(x):
+                index[iy, ix] = argnanmedoid(flattened.values[:, :, iy, ix])
+        return index
+
+    if any(not isinstance(var.data, np.ndarray) for var in data.data_vars.values()):
+        # keep dask backed data lazy
+        return medoid_index_array(data.to_array(dim='variable'), index_dtype=index_dtype).values
+
+    return _argnanmedoid_kernel(_stack_pixels(data)).astype(index_dtype)
@@ -38,6 +38,13 @@ class Statistic(abc.ABC):
         """
         return input_measurements
 
+    def warmup(self):
+        """
+        Prepare anything expensive the statistic needs before computing, such as compiling kernels.
+
+        Called before every task using the statistic is computed, so should be cheap once done.
+        """
+
     def is_iterative(self) -> bool:
         """
         Should return True if class supports iterative computation one time slice at a time.
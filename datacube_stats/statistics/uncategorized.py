@@ -1,17 +1,21 @@
 import warnings
 
-from collections import OrderedDict, Sequence
-from functools import partial
+from collections import Sequence
 from datetime import datetime
+from functools import reduce as reduce_
+from operator import and_ as and_op
 
 import numpy as np
 import xarray
 
 from datacube.model import Measurement
 from datacube_stats.utils.dates import datetime64_to_inttime
-from datacube_stats.utils import da_nodata
-from datacube_stats.stat_funcs import axisindex, argpercentile, _compute_medoid
+from datacube_stats.utils import da_nodata, da_is_float
+from datacube_stats.stat_funcs import axisindex, argpercentile, argpercentiles, _compute_medoid
 from datacube_stats.stat_funcs import anynan, section_by_index, medoid_indices
+from datacube_stats.stat_funcs import nd_min_mean_max, ND_FUSED_STATS, wofs_counts
+from datacube_stats.stat_funcs import _argnanmedoid_kernel
+from datacube_stats.stat_funcs import warmup_medoid, warmup_nd, warmup_wofs
 
 from .core import Statistic, PerPixelMetadata, SimpleStatistic
 from .core import StatsProcessingError, StatsConfigurationError
@@ -49,6 +53,9 @@ class WofsStats(Statistic):
     def __init__(self, freq_only=False):
         self.freq_only = freq_only
 
+    def warmup(self):
+        warmup_wofs()
+
     def compute(self, data):
         is_integer_type = np.issubdtype(data.water.dtype, np.integer)
 
@@ -58,8 +65,16 @@ class WofsStats(Statistic):
 
         # 128 == clear and wet, 132 == clear and wet and masked for sea
         # The PQ sea mask that we use is dodgy and should be ignored. It excludes lots of useful data
-        wet = ((data.water == 128) | (data.water == 132)).sum(dim='time')
-        dry = ((data.water == 0) | (data.water == 4)).sum(dim='time')
+        if wofs_counts is not None:
+            # one pass through time, no intermediate (time, y, x) boolean arrays
+            wet, dry = xarray.apply_ufunc(wofs_counts, data.water,
+                                          input_core_dims=[['time']],
+                                          output_core_dims=[[], []],
+                                          dask='parallelized',
+                                          output_dtypes=[np.int64, np.int64])
+        else:
+            wet = ((data.water == 128) | (data.water == 132)).sum(dim='time')
+            dry = ((data.water == 0) | (data.water == 4)).sum(dim='time')
         clear = wet + dry
         with np.errstate(divide='ignore', invalid='ignore'):
             frequency = wet / clear
@@ -96,6 +111,10 @@ class NormalisedDifferenceStats(Statistic):
     By default will clamp output values in the range [-1, 1] by setting values outside
     this range to NaN.
 
+    Floating point bands are computed on in their own type, eg. the `dtype` of the `computation` section
+    when `nodata` is masked. Integer bands (loaded with `mask_nodata: false`) are always computed on in `float32`,
+    the type of the outputs.
+
     :param name: The common name of a normalised difference.
                  eg. `ndvi` for `(nir-red)/(nir+red)`
                      `ndwi` for `(green-nir)/(green+nir)`
@@ -111,12 +130,37 @@ class NormalisedDifferenceStats(Statistic):
         self.name = name
         self.clamp_outputs = clamp_outputs
 
+    def warmup(self):
+        if any(stat in ND_FUSED_STATS for stat in self.stats):
+            warmup_nd()
+
     def compute(self, data):
-        nd = (data[self.band1] - data[self.band2]) / (data[self.band1] + data[self.band2])
+        # integer bands would wrap on subtraction and promote to float64 on division,
+        # so use float32 whatever `computation.dtype` is, see the class docstring
+        band1, band2 = [band if da_is_float(band) else band.astype(np.float32)
+                        for band in (data[self.band1], data[self.band2])]
+
+        fused = {}
+        if nd_min_mean_max is not None and any(stat in ND_FUSED_STATS for stat in self.stats):
+            # single pass through time for min/mean/max, the normalised difference is never stored
+            dtype = np.result_type(band1.dtype, band2.dtype, np.float32)
+            fused = dict(zip(ND_FUSED_STATS,
+                             xarray.apply_ufunc(nd_min_mean_max, band1, band2,
+                                                input_core_dims=[['time'], ['time']],
+                                                output_core_dims=[[] for _ in ND_FUSED_STATS],
+                                                dask='parallelized',
+                                                output_dtypes=[dtype for _ in ND_FUSED_STATS])))
+
+        nd = None
         outputs = {}
         for stat in self.stats:
             name = '_'.join([self.name, stat])
-            outputs[name] = getattr(nd, stat)(dim='time', keep_attrs=True)
+            if stat in fused:
+                outputs[name] = fused[stat]
+            else:
+                if nd is None:
+                    nd = (band1 - band2) / (band1 + band2)
+                outputs[name] = getattr(nd, stat)(dim='time', keep_attrs=True)
             if self.clamp_outputs:
                 self._clamp_outputs(outputs[name])
         return xarray.Dataset(outputs, attrs=dict(crs=data.crs))
@@ -257,42 +301,36 @@ class PerBandIndexStat(SimpleStatistic):
 
     def compute(self, data):
         index = super(PerBandIndexStat, self).compute(data)
+        names = list(index.data_vars)
 
-        def index_dataset(var):
-            return axisindex(data.data_vars[var.name].values, var.values)
+        # indices of every band stacked once, shape (variable, y, x), shared by the gathers below
+        indices = index.to_array(dim='variable').values
 
-        data_values = index.apply(index_dataset)
+        def make_dataset(suffix, per_band_values):
+            return xarray.Dataset({name + suffix: (index[name].dims, values)
+                                   for name, values in zip(names, per_band_values)},
+                                  coords=index.coords)
+
+        def take_band(name, band_index):
+            var = data.data_vars[name]
+            axis = var.get_axis_num('time')
+            return np.take_along_axis(var.values, np.expand_dims(band_index, axis), axis=axis).squeeze(axis)
 
-        all_values = [data_values]
+        all_values = [make_dataset('', (take_band(name, band_index)
+                                        for name, band_index in zip(names, indices)))]
         metadata = self.per_pixel_metadata
 
         if 'observed' in metadata or 'observed_date' in metadata:
-            def index_time(var):
-                return data.time.values[var.values]
-
-            time_values = index.apply(
-                index_time).rename(
-                    OrderedDict((name, name + '_observed')
-                                for name in index.data_vars))
+            time_values = data.time.values[indices]
 
         if 'observed' in metadata:
-            all_values += [time_values]
+            all_values += [make_dataset('_observed', time_values)]
 
         if 'observed_date' in metadata:
-            text_values = time_values.apply(datetime64_to_inttime).rename(
-                OrderedDict((name, name + '_date')
-                            for name in time_values.data_vars))
-
-            all_values += [text_values]
+            all_values += [make_dataset('_observed_date', datetime64_to_inttime(time_values))]
 
         if 'source' in metadata:
-            def index_source(var):
-                return data.source.values[var.values]
-
-            source_values = index.apply(index_source).rename(OrderedDict((name, name + '_source')
-                                                                         for name in index.data_vars))
-
-            all_values += [source_values]
+            all_values += [make_dataset('_source', data.source.values[indices])]
 
         return xarray.merge(all_values)
 
@@ -357,13 +395,21 @@ class Percentile(PerBandIndexStat):
         not_enough = np.logical_and(count_valid < self.minimum_valid_observations,
                                     count_valid > 0)
 
-        def single(q):
-            stat_func = partial(xarray.Dataset.reduce, dim='time',
-                                func=argpercentile, q=q)
+        # sort every band through time once, for all the requested percentiles
+        indices = {name: argpercentiles(var.values, self.qs, axis=var.get_axis_num('time'))
+                   for name, var in data.data_vars.items()}
+        template = data.isel(time=0, drop=True)
+
+        def single(i, q):
+            suffix = '_PC_' + str(q)
+
+            def stat_func(renamed):
+                return xarray.Dataset({name + suffix: template[name].copy(data=indices[name][i])
+                                       for name in data.data_vars})
 
             per_pixel_metadata = self.per_pixel_metadata
 
-            renamed = data.rename({var: var + '_PC_' + str(q)
+            renamed = data.rename({var: var + suffix
                                    for var in data.data_vars})
 
             result = PerBandIndexStat(stat_func=stat_func,
@@ -379,7 +425,7 @@ class Percentile(PerBandIndexStat):
 
             return result.apply(mask_not_enough, keep_attrs=True)
 
-        return xarray.merge(single(q) for q in self.qs)
+        return xarray.merge(single(i, q) for i, q in enumerate(self.qs))
 
     def measurements(self, input_measurements):
         renamed = []
@@ -477,11 +523,17 @@ class MedoidSimple(PerStatIndexStat):
         super(MedoidSimple, self).__init__(stat_func=_compute_medoid,
                                            extra_metadata_producers=[ObservedDaysSince()])
 
+    def warmup(self):
+        warmup_medoid()
+
 
 class MedoidNoProv(PerStatIndexStat):
     def __init__(self):
         super(MedoidNoProv, self).__init__(stat_func=_compute_medoid)
 
+    def warmup(self):
+        warmup_medoid()
+
 
 def select_names(wanted_names, all_names):
     """ Only select the measurements names in the wanted list. """
@@ -489,9 +541,10 @@ def select_names(wanted_names, all_names):
         # default: include everything
         return all_names
 
+    available = frozenset(all_names)
     invalid = [name
                for name in wanted_names
-               if name not in all_names]
+               if name not in available]
 
     if invalid:
         msg = 'Specified measurements not found: {}'
@@ -529,11 +582,14 @@ class Medoid(Statistic):
         else:
             self._metadata_producers = metadata_producers
 
+    def warmup(self):
+        warmup_medoid()
+
     def measurements(self, input_measurements):
         base = super(Medoid, self).measurements(input_measurements)
 
-        selected_names = select_names(self.output_measurements,
-                                      [m.name for m in base])
+        selected_names = frozenset(select_names(self.output_measurements,
+                                                [m.name for m in base]))
 
         selected = [m for m in base if m.name in selected_names]
 
@@ -548,12 +604,16 @@ class Medoid(Statistic):
                                        list(data.data_vars))]
 
         # calculate medoid indices
-        arr = input_data.to_array().values
-        invalid = anynan(arr, axis=0)
-        index = medoid_indices(arr, invalid)
+        if _argnanmedoid_kernel is not None:
+            # stacks the bands straight into the layout of the kernel, dask backed data block by block
+            index = _compute_medoid(input_data, index_dtype=np.int64)
+        else:
+            arr = input_data.to_array(dim='variable').values
+            index = medoid_indices(arr, anynan(arr, axis=0))
 
         # pixels for which there is not enough data
-        count_valid = np.count_nonzero(~invalid, axis=0)
+        valid = reduce_(and_op, [var.notnull() for var in input_data.data_vars.values()])
+        count_valid = valid.sum(dim='time').values
         not_enough = count_valid < self.minimum_valid_observations
 
         # only report the measurements requested
@@ -1,4 +1,6 @@
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterator
 from functools import partial
 
@@ -19,24 +21,32 @@ from .utils.timer import MultiTimer
 
 DEFAULT_GROUP_BY = 'time'
 
+#: Default number of index queries to run at once when generating gridded tasks.
+#: Each one holds a database connection, so keep it within the connection pool size.
+DEFAULT_MAX_CONCURRENT_QUERIES = 4
+
 _LOG = logging.getLogger(__name__)
 
 
-def select_task_generator(input_region, storage, filter_product):
+def select_task_generator(input_region, storage, filter_product,
+                          max_concurrent_queries=DEFAULT_MAX_CONCURRENT_QUERIES):
     if input_region is None or input_region == {}:
         _LOG.info('No input_region specified. Generating full available spatial region, gridded files.')
-        return GriddedTaskGenerator(storage)
+        return GriddedTaskGenerator(storage, max_concurrent_queries=max_concurrent_queries)
 
     elif 'geometry' in input_region:  # Larger spatial region
         # A large, multi-tile input region, specified as geojson. Output will be individual tiles.
         geometry = Geometry(input_region['geometry'], CRS('EPSG:4326'))  # GeoJSON is always 4326
-        return GriddedTaskGenerator(storage, geopolygon=geometry, tile_indexes=input_region.get('tiles'))
+        return GriddedTaskGenerator(storage, geopolygon=geometry, tile_indexes=input_region.get('tiles'),
+                                    max_concurrent_queries=max_concurrent_queries)
 
     elif 'tile' in input_region:  # For one tile
-        return GriddedTaskGenerator(storage, tile_indexes=[input_region['tile']])
+        return GriddedTaskGenerator(storage, tile_indexes=[input_region['tile']],
+                                    max_concurrent_queries=max_concurrent_queries)
 
     elif 'tiles' in input_region:  # List of tiles
-        return GriddedTaskGenerator(storage, tile_indexes=input_region['tiles'])
+        return GriddedTaskGenerator(storage, tile_indexes=input_region['tiles'],
+                                    max_concurrent_queries=max_concurrent_queries)
 
     elif 'from_file' in input_region:
         _LOG.info('Input spatial region specified by file: %s', input_region['from_file'])
@@ -52,7 +62,7 @@ def select_task_generator(input_region, storage, filter_product):
         else:
             _LOG.info('Generating tasks based on grid.')
             geometry = boundary_polygon_from_file(input_region['from_file'])
-            return GriddedTaskGenerator(storage, geopolygon=geometry)
+            return GriddedTaskGenerator(storage, geopolygon=geometry, max_concurrent_queries=max_concurrent_queries)
     else:
         _LOG.info('Generating statistics for an ungridded `input region`. Output as a single file.')
         return NonGriddedTaskGenerator(input_region=input_region, storage=storage,
@@ -71,11 +81,24 @@ def boundary_polygon_from_file(filename: str) -> Geometry:
     return boundary_polygon
 
 
+def _consume(tasks):
+    """
+    Yield the list of `tasks` in order, removing each from the list as it is handed out, so that a task
+    (and the datasets it references) can be released as soon as the consumer is done with it.
+    """
+    tasks.reverse()
+    while tasks:
+        yield tasks.pop()
+
+
 class GriddedTaskGenerator:
-    def __init__(self, storage, geopolygon=None, tile_indexes=None):
+    def __init__(self, storage, geopolygon=None, tile_indexes=None,
+                 max_concurrent_queries=DEFAULT_MAX_CONCURRENT_QUERIES):
         self.grid_spec = _make_grid_spec(storage)
         self.geopolygon = geopolygon
         self.tile_indexes = tile_indexes
+        #: Upper bound on the number of index queries in flight at once
+        self.max_concurrent_queries = max_concurrent_queries
         self._total_unmatched = 0
 
     def __call__(self, index, sources_spec, date_ranges) -> Iterator[StatsTask]:
@@ -95,14 +118,14 @@ class GriddedTaskGenerator:
             timer = MultiTimer().start('creating_tasks')
             created_tasks = 0
 
-            if self.tile_indexes is not None:
-                for tile_index in self.tile_indexes:
-                    _LOG.debug('task for tile %s', tile_index)
-                    for task in self.collect_tasks(workflow, time_period, sources_spec, tile_index):
-                        created_tasks += 1
-                        yield task
-            else:
-                for task in self.collect_tasks(workflow, time_period, sources_spec):
+            # the only pool of the task generation, so at most `max_concurrent_queries` queries run at once
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_queries) as executor:
+                if self.tile_indexes is not None:
+                    tasks = self._collect_tiles_concurrently(executor, workflow, time_period, sources_spec)
+                else:
+                    tasks = _consume(self.collect_tasks(workflow, time_period, sources_spec, executor=executor))
+
+                for task in tasks:
                     created_tasks += 1
                     yield task
 
@@ -112,33 +135,83 @@ class GriddedTaskGenerator:
                 _LOG.info('Created %s tasks for time period: %s. In: %s',
                           created_tasks, time_period, timer)
 
-    def collect_tasks(self, workflow, time_period, sources_spec, tile_index=None):
+    def _collect_tiles_concurrently(self, executor, workflow, time_period, sources_spec):
+        """
+        Collect the tasks of each of the `tile_indexes`, querying the index for up to
+        `max_concurrent_queries` tiles at once on `executor`. Tasks are yielded in tile order.
+        """
+        def collect(tile_index):
+            _LOG.debug('task for tile %s', tile_index)
+            return self._collect_tasks(workflow, time_period, sources_spec, tile_index)
+
+        def result(tile_index, future):
+            try:
+                tasks, unmatched = future.result()
+            except Exception:
+                _LOG.error('Error collecting tasks for tile %s, time period %s', tile_index, time_period)
+                raise
+            self._total_unmatched += unmatched
+            return tasks
+
+        # (tile index, future) pairs, so that each result is known to belong to its tile
+        pending = deque()
+        for tile_index in self.tile_indexes:
+            if len(pending) >= self.max_concurrent_queries:
+                yield from _consume(result(*pending.popleft()))
+            pending.append((tile_index, executor.submit(collect, tile_index)))
+
+        while pending:
+            yield from _consume(result(*pending.popleft()))
+
+    def collect_tasks(self, workflow, time_period, sources_spec, tile_index=None, executor=None):
         """ Collect tasks for a time period. """
+        tasks, unmatched = self._collect_tasks(workflow, time_period, sources_spec, tile_index, executor)
+        self._total_unmatched += unmatched
+        return tasks
+
+    def _collect_tasks(self, workflow, time_period, sources_spec, tile_index=None, executor=None):
+        """
+        Collect tasks for a time period, and the number of source datasets for which masks were not found.
+
+        The queries for each source are run on `executor` if given, otherwise one after the other.
+        """
         # Tasks are grouped by tile_index, and may contain sources from multiple places
         # Each source may be masked by multiple masks
 
         # pylint: disable=too-many-locals
-        tasks = {}
+        def list_cells(query):
+            _, source_spec, ep_range = query
+            group_by_name = source_spec.get('group_by', DEFAULT_GROUP_BY)
+
+            products = [source_spec['product']] + [mask['product'] for mask in source_spec.get('masks', [])]
+
+            product_query = {products[0]: {'source_filter': source_spec.get('source_filter', None)}}
 
+            return multi_product_list_cells(products, workflow,
+                                            product_query=product_query,
+                                            cell_index=tile_index,
+                                            time=ep_range,
+                                            group_by=group_by_name,
+                                            geopolygon=self.geopolygon)
+
+        queries = []
         for source_index, source_spec in enumerate(sources_spec):
             ep_range = filter_time_by_source(source_spec.get('time'), time_period)
             if ep_range is None:
                 _LOG.info("Datasets not included for %s and time range for %s", source_spec['product'], time_period)
                 continue
-            group_by_name = source_spec.get('group_by', DEFAULT_GROUP_BY)
-
-            products = [source_spec['product']] + [mask['product'] for mask in source_spec.get('masks', [])]
+            queries.append((source_index, source_spec, ep_range))
 
-            product_query = {products[0]: {'source_filter': source_spec.get('source_filter', None)}}
+        if not queries:
+            return [], 0
 
-            (data, *masks), unmatched_ = multi_product_list_cells(products, workflow,
-                                                                  product_query=product_query,
-                                                                  cell_index=tile_index,
-                                                                  time=ep_range,
-                                                                  group_by=group_by_name,
-                                                                  geopolygon=self.geopolygon)
+        # each source is an independent read-only index query
+        results = list((executor.map if executor is not None else map)(list_cells, queries))
 
-            self._total_unmatched += report_unmatched_datasets(unmatched_[0], _LOG.warning)
+        tasks = {}
+        total_unmatched = 0
+        for (source_index, source_spec, ep_range), ((data, *masks), unmatched_) in zip(queries, results):
+            total_unmatched += report_unmatched_datasets(unmatched_[0], _LOG.warning)
 
             for tile, sources in data.items():
                 task = tasks.setdefault(tile, StatsTask(time_period=ep_range, spatial_id={'x': tile[0], 'y': tile[1]}))
@@ -147,7 +220,7 @@ class GriddedTaskGenerator:
                                                spec=source_spec,
                                                source_index=source_index))
 
-        return list(tasks.values())
+        return list(tasks.values()), total_unmatched
 
     def __del__(self):
         if self._total_unmatched > 0:
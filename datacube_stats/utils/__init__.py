@@ -15,7 +15,7 @@ from datetime import timedelta
 
 from datacube.api.query import Query
 
-from datacube.storage.masking import mask_invalid_data, create_mask_value
+from datacube.storage.masking import create_mask_value
 from datacube.api import Tile
 from datacube.model import Range
 from datacube.ui.task_app import pickle_stream, unpickle_stream
@@ -63,13 +63,38 @@ def first_var(ds):
     return first(ds.data_vars.values())
 
 
-def sensible_mask_invalid_data(data):
+def sensible_mask_invalid_data(data, dtype=np.float32):
+    """
+    Replace `nodata` values with NaN, like :func:`datacube.storage.masking.mask_invalid_data`,
+    without copying more than needed.
+
+    Integer variables are converted to `dtype` (not the float64 `xarray.DataArray.where()` would use)
+    and masked in place of that copy, floating point variables are copied once and masked. `data` is left
+    untouched. The attributes of every variable are kept, except for `nodata`.
+    """
     # TODO This should be pushed up to datacube-core
-    # xarray.DataArray.where() converts ints to floats, since NaNs are used to represent nodata
-    # by default, this uses float64, which is way over the top for an int16 value, so
-    # lets convert to float32 first, to save a bunch of memory.
-    data = _convert_to_floats(data)  # This is stripping out variable attributes
-    return mask_invalid_data(data)
+    assert isinstance(data, xarray.Dataset)
+
+    def mask_var(da):
+        nodata = getattr(da, 'nodata', None)
+        if not da_is_float(da):
+            out = da.astype(dtype)
+        else:
+            # only copy the values if they are about to be written to
+            out = da.copy(deep=nodata is not None and isinstance(da.data, np.ndarray))
+
+        if nodata is not None:
+            if isinstance(out.data, np.ndarray):
+                np.putmask(out.data, out.data == nodata, np.nan)
+            else:
+                # not backed by memory we can write to (e.g. dask)
+                out = out.where(out != nodata)
+
+        out.attrs = {key: value for key, value in da.attrs.items() if key != 'nodata'}
+        return out
+
+    return xarray.Dataset({name: mask_var(da) for name, da in data.data_vars.items()},
+                          coords=data.coords, attrs=data.attrs)
 
 
 def sensible_where(data, mask):
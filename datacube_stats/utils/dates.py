@@ -6,6 +6,7 @@ Date utility functions to be used by statistics apps
 import logging
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 from dateutil.relativedelta import relativedelta
 from dateutil.rrule import YEARLY, MONTHLY, DAILY, rrule
@@ -126,7 +127,17 @@ def datetime64_to_inttime(var):
     :return: ndarray of ints, representing the given time to the nearest day
     """
     values = getattr(var, 'values', var)
-    years = values.astype('datetime64[Y]').astype('int32') + 1970
-    months = values.astype('datetime64[M]').astype('int32') % 12 + 1
-    days = (values.astype('datetime64[D]') - values.astype('datetime64[M]') + 1).astype('int32')
-    return years * 10000 + months * 100 + days
+
+    # civil-from-days (http://howardhinnant.github.io/date_algorithms.html#civil_from_days)
+    # a single cast to days since epoch followed by integer arithmetic
+    days = values.astype('datetime64[D]').astype('int64') + 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + np.where(mp < 10, 3, -9)
+    year = yoe + era * 400 + (month <= 2)
+
+    return (year * 10000 + month * 100 + day).astype(np.int32)
@@ -23,6 +23,9 @@ setup(
                       'psutil'],
     setup_requires=['pytest-runner'],
     tests_require=['pytest', 'mock', 'hypothesis'],
+    extras_require={
+        'numba': ['numba'],
+    },
     entry_points={
         'console_scripts': [
             'datacube-stats = datacube_stats.main:main',
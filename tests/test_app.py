@@ -6,14 +6,25 @@ Test that the StatsApp can:
 - generate tasks from it
 - run the tasks
 """
+import json
+import time
+from datetime import datetime
+
 import mock
+import numpy as np
 import pytest
+import xarray as xr
 
-from datacube.model import MetadataType
+from datacube.model import MetadataType, Measurement
+from datacube.utils.geometry import GeoBox, CRS
+from affine import Affine
 from datacube_stats.main import OutputProduct
-from datacube_stats.main import StatsApp
-from datacube_stats.models import StatsTask
-from datacube_stats.statistics import StatsConfigurationError, ReducingXarrayStatistic
+from datacube_stats.main import StatsApp, CONFIG_CACHE_ENV, _read_config_document, _source_measurement_defs, \
+    execute_task, load_masked_data, StatsProcessingException
+from datacube_stats.models import StatsTask, DataSource
+from datacube_stats import stat_funcs
+from datacube_stats.statistics import StatsConfigurationError, ReducingXarrayStatistic, WofsStats
+from datacube_stats.utils.tide_utility import Feature
 
 
 def test_create_and_validate_stats_app(sample_stats_config):
@@ -141,3 +152,213 @@ def test_generate_non_gridded_tasks():
 @pytest.mark.xfail
 def test_generate_single_cell_tasks():
     assert False
+
+
+def test_read_config_cache(tmpdir, monkeypatch):
+    config_file = tmpdir / 'config.yaml'
+    config_file.write('location: /tmp/first\n')
+    monkeypatch.setenv(CONFIG_CACHE_ENV, str(tmpdir / 'cache'))
+
+    assert _read_config_document(str(config_file)) == {'location': '/tmp/first'}
+    assert len((tmpdir / 'cache').listdir()) == 1
+    assert json.loads((tmpdir / 'cache').listdir()[0].read()) == {'location': '/tmp/first'}
+    assert _read_config_document(str(config_file)) == {'location': '/tmp/first'}
+
+    # edited files are parsed again
+    config_file.write('location: /tmp/second\n')
+    assert _read_config_document(str(config_file)) == {'location': '/tmp/second'}
+    assert len((tmpdir / 'cache').listdir()) == 2
+
+
+def test_mismatched_source_measurements():
+    sources = [{'product': 'ls5_nbar_albers', 'measurements': ['red', 'green']},
+               {'product': 'ls7_nbar_albers', 'measurements': ['red', 'green']},
+               {'product': 'ls8_nbar_albers', 'measurements': ['green', 'red']}]
+
+    with pytest.raises(StatsConfigurationError) as e:
+        _source_measurement_defs(mock.MagicMock(), sources)
+    assert 'ls8_nbar_albers' in str(e.value)
+
+
+def test_validate_sources(sample_stats_config):
+    index = mock.MagicMock()
+    index.products.get_by_name.return_value.measurements = {'red': {}}
+    StatsApp(config=sample_stats_config).validate_sources(index)
+
+    index.products.get_by_name.return_value.measurements = {'blue': {}}
+    with pytest.raises(StatsConfigurationError):
+        StatsApp(config=sample_stats_config).validate_sources(index)
+
+    index.products.get_by_name.return_value = None
+    with pytest.raises(StatsConfigurationError):
+        StatsApp(config=sample_stats_config).validate_sources(index)
+
+
+def test_generate_tasks_skips_duplicates(sample_stats_config):
+    stats_app = StatsApp(config=sample_stats_config)
+    time_period = (datetime(2015, 1, 1), datetime(2015, 4, 1))
+    tasks = [StatsTask(time_period, {'x': 1, 'y': 2}),
+             StatsTask(time_period, {'y': 2, 'x': 1}),
+             StatsTask(time_period, {'x': 2, 'y': 2})]
+    stats_app.task_generator = mock.MagicMock(return_value=iter(tasks))
+
+    generated = list(stats_app.generate_tasks(mock.MagicMock(), output_products={}))
+
+    assert [task.spatial_id for task in generated] == [{'x': 1, 'y': 2}, {'x': 2, 'y': 2}]
+
+
+def test_generate_tasks_keeps_distinct_features(sample_stats_config):
+    stats_app = StatsApp(config=sample_stats_config)
+    time_period = (datetime(2015, 1, 1), datetime(2015, 4, 1))
+    crs_wkt = 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],' \
+              'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]'
+
+    def feature(offset):
+        polygon = [[(offset, 0), (offset + 1, 0), (offset + 1, 1), (offset, 1), (offset, 0)]]
+        return Feature({}, {'type': 'Polygon', 'coordinates': polygon}, crs_wkt, None)
+
+    def tasks():
+        # without ids all features share a spatial_id, and each is dropped once its task is done with
+        for offset in range(20):
+            yield StatsTask(time_period, {'feature_id': '(none)'}, feature=feature(offset))
+        yield StatsTask(time_period, {'feature_id': '(none)'}, feature=feature(0))
+
+    stats_app.task_generator = mock.MagicMock(return_value=tasks())
+
+    # count without holding on to the tasks, like a task runner would
+    assert sum(1 for _ in stats_app.generate_tasks(mock.MagicMock(), output_products={})) == 20
+
+
+class _RecordingOutput:
+    """ Records the chunks written to it, in order. """
+    allows_concurrent_loading = True
+
+    def __init__(self, task):
+        self.written = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def write_chunk(self, prod_name, chunk, result):
+        self.written.append((prod_name, str(chunk), result))
+
+
+def _execute_in_chunks(monkeypatch, statistic, dataset, num_threads):
+    """ Run `statistic` over `dataset` in 10x10 chunks, returning the chunks written out, in order. """
+    def load_data(chunk, sources, geom=None, time_orders=None, dtype='float32'):
+        # finish chunks out of order
+        time.sleep(np.random.random() * 0.01)
+        return dataset.isel(time=chunk[0], y=chunk[1], x=chunk[2])
+
+    monkeypatch.setattr('datacube_stats.main.load_data', load_data)
+
+    tile = mock.MagicMock(shape=tuple(dataset.sizes[dim] for dim in ('time', 'y', 'x')), dims=('time', 'y', 'x'))
+    inputs = [Measurement(name=name, dtype=str(var.dtype), nodata=-999, units='1')
+              for name, var in dataset.data_vars.items()]
+    output_product = mock.MagicMock(statistic=statistic, compute=statistic.compute,
+                                    data_measurements=[dict(m) for m in statistic.measurements(inputs)])
+    task = StatsTask((datetime(2015, 1, 1), datetime(2016, 1, 1)), {'x': 1, 'y': 2},
+                     sources=[mock.MagicMock(data=tile)], output_products={'stat': output_product})
+    outputs = []
+
+    def output_driver(task):
+        outputs.append(_RecordingOutput(task))
+        return outputs[-1]
+
+    execute_task(task, output_driver, chunking={'x': 10, 'y': 10}, num_threads=num_threads)
+    return outputs[0].written
+
+
+def _assert_same_chunks(concurrent, serial):
+    assert [(name, chunk) for name, chunk, _ in concurrent] == [(name, chunk) for name, chunk, _ in serial]
+    for (_, _, expected), (_, _, result) in zip(serial, concurrent):
+        xr.testing.assert_identical(result, expected)
+
+
+def test_execute_task_concurrently_matches_serial(monkeypatch):
+    data = np.random.random((5, 40, 30)).astype(np.float32)
+    data[np.random.random(data.shape) < 0.1] = np.nan
+    dataset = xr.Dataset({'red': (('time', 'y', 'x'), data)})
+    statistic = ReducingXarrayStatistic('mean')
+
+    serial = _execute_in_chunks(monkeypatch, statistic, dataset, num_threads=1)
+    concurrent = _execute_in_chunks(monkeypatch, statistic, dataset, num_threads=4)
+
+    assert len(serial) == 12
+    _assert_same_chunks(concurrent, serial)
+
+
+def _wofs_dataset():
+    water = np.random.choice(np.array([0, 4, 128, 132, 1], dtype=np.uint8), size=(5, 40, 30))
+    return xr.Dataset({'water': (('time', 'y', 'x'), water)}, attrs={'crs': 'Fake CRS'})
+
+
+def test_execute_kernel_statistic_concurrently(monkeypatch):
+    # the kernels run on every pool thread at once, with whichever threading layer numba picked
+    dataset = _wofs_dataset()
+
+    serial = _execute_in_chunks(monkeypatch, WofsStats(), dataset, num_threads=1)
+    concurrent = _execute_in_chunks(monkeypatch, WofsStats(), dataset, num_threads=2)
+
+    assert len(serial) == 12
+    _assert_same_chunks(concurrent, serial)
+
+
+@pytest.mark.skipif(stat_funcs.njit is None, reason='requires numba')
+def test_execute_task_serially_on_workqueue_threading_layer(monkeypatch):
+    dataset = _wofs_dataset()
+    serial = _execute_in_chunks(monkeypatch, WofsStats(), dataset, num_threads=1)
+
+    monkeypatch.setattr('datacube_stats.stat_funcs.threading_layer', lambda: 'workqueue')
+    pool = mock.MagicMock(side_effect=AssertionError('chunks must not be processed concurrently'))
+    monkeypatch.setattr('datacube_stats.main.ThreadPoolExecutor', pool)
+
+    _assert_same_chunks(_execute_in_chunks(monkeypatch, WofsStats(), dataset, num_threads=2), serial)
+
+
+def test_execute_task_reports_warmup_errors():
+    statistic = mock.MagicMock()
+    statistic.warmup.side_effect = RuntimeError('kernel failed to compile')
+    task = StatsTask((datetime(2015, 1, 1), datetime(2016, 1, 1)), {'x': 1, 'y': 2},
+                     output_products={'mean': mock.MagicMock(statistic=statistic)})
+    output_driver = mock.MagicMock()
+
+    with pytest.raises(StatsProcessingException):
+        execute_task(task, output_driver, chunking={'x': 10, 'y': 10})
+
+    statistic.warmup.assert_called_once_with()
+    output_driver.assert_not_called()
+
+
+@pytest.mark.parametrize('spec,expected', [({}, np.float32(np.nan)),
+                                           ({'mask_nodata': False}, np.int16(-999)),
+                                           ({'mask_inplace': True}, np.float32(np.nan))])
+def test_load_fully_masked_chunk(spec, expected):
+    times = np.array(['2015-01-01', '2015-02-01'], dtype='datetime64[ns]')
+    geobox = GeoBox(4, 3, Affine(25, 0, 1500000, 0, -25, -4000000), CRS('EPSG:3577'))
+
+    tile = mock.MagicMock(geobox=geobox, sources=xr.DataArray(np.empty(2, dtype=object), dims=['time'],
+                                                              coords={'time': times}))
+    tile.__getitem__.return_value = tile
+    tile.product.lookup_measurements.return_value = {
+        'red': Measurement(name='red', dtype='int16', nodata=-999, units='1')}
+
+    mask = xr.Dataset({'pixelquality': (('time', 'y', 'x'), np.full((2, 3, 4), 10, dtype='int16'))})
+    source = DataSource(data=tile, masks=[tile],
+                        spec={'product': 'ls8_nbar_albers', 'measurements': ['red'],
+                              'masks': [{'product': 'ls8_pq_albers', 'measurement': 'pixelquality',
+                                         'less_than': 5}],
+                              **spec})
+
+    with mock.patch('datacube_stats.main.GridWorkflow.load', return_value=mask) as load:
+        data = load_masked_data((slice(0, 2), slice(0, 3), slice(0, 4)), source)
+
+    # only the mask is read
+    assert load.call_count == 1
+    assert data.red.shape == (2, 3, 4)
+    assert data.red.dtype == expected.dtype
+    assert list(data.time.values) == list(times)
+    np.testing.assert_array_equal(data.red.values, expected)
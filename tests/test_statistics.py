@@ -12,12 +12,14 @@ import xarray as xr
 from hypothesis import given, settings
 
 import datacube_stats.statistics
+from datacube_stats import stat_funcs
 
 from datacube.model import Measurement
 from datacube.utils.geometry import CRS
 from datacube_stats.incremental_stats import mk_incremental_mean, mk_incremental_min, mk_incremental_sum, \
     mk_incremental_max, mk_incremental_counter
-from datacube_stats.stat_funcs import nan_percentile, argpercentile, axisindex
+from datacube_stats.stat_funcs import nan_percentile, argpercentile, argpercentiles, axisindex, argnanmedoid, \
+    _compute_medoid
 from datacube_stats.statistics import NormalisedDifferenceStats, WofsStats, TCWStats, \
     StatsConfigurationError, Medoid, GeoMedian
 
@@ -65,6 +67,38 @@ def test_argpercentile():
     assert np.isclose(np_result, argpercentile_result).all()
 
 
+def test_argpercentiles():
+    test_arr = np.random.random((10, 50, 50)).astype(np.float32)
+    test_arr[np.random.random(test_arr.shape) < 0.1] = np.NaN
+
+    qs = [10, 50, 90]
+    for q, index in zip(qs, argpercentiles(test_arr, qs, axis=0)):
+        assert (index == argpercentile(test_arr, q=q, axis=0)).all()
+
+
+def test_compute_medoid():
+    arr = np.random.random((3, 10, 20, 20)).astype(np.float32)
+    arr[np.random.random(arr.shape) < 0.1] = np.NaN
+    dataset = xr.Dataset(data_vars={'band%d' % i: (('time', 'y', 'x'), arr[i]) for i in range(3)})
+
+    expected = np.array([[argnanmedoid(arr[:, :, iy, ix]) for ix in range(20)]
+                         for iy in range(20)])
+
+    assert (_compute_medoid(dataset) == expected).all()
+
+
+def test_compute_medoid_geographic_dims():
+    arr = np.random.random((3, 10, 20, 15)).astype(np.float32)
+    arr[np.random.random(arr.shape) < 0.1] = np.NaN
+    dataset = xr.Dataset(data_vars={'band%d' % i: (('time', 'latitude', 'longitude'), arr[i]) for i in range(3)})
+
+    expected = np.array([[argnanmedoid(arr[:, :, iy, ix]) for ix in range(15)]
+                         for iy in range(20)])
+
+    assert (_compute_medoid(dataset) == expected).all()
+    assert (_compute_medoid(dataset.transpose('latitude', 'time', 'longitude')) == expected).all()
+
+
 def test_xarray_reduce():
     arr = np.random.random((100, 100, 5))
     dataarray = xr.DataArray(arr, dims=('x', 'y', 'time'))
@@ -115,6 +149,63 @@ def test_new_med_ndwi():
     assert 'ndwi_median' in result.data_vars
 
 
+def test_normalised_difference_matches_xarray():
+    ndstat = NormalisedDifferenceStats('green', 'nir', 'ndwi', stats=['min', 'mean', 'max'], clamp_outputs=False)
+
+    green = np.random.uniform(low=0, high=1, size=(5, 100, 100))
+    nir = np.random.uniform(low=0, high=1, size=(5, 100, 100))
+    green[np.random.random(green.shape) < 0.2] = np.NaN
+    dataset = xr.Dataset(data_vars={'green': (('time', 'y', 'x'), green), 'nir': (('time', 'y', 'x'), nir)},
+                         coords={'time': list(range(5))}, attrs={'crs': 'Fake CRS'})
+    result = ndstat.compute(dataset)
+
+    nd = (dataset.green - dataset.nir) / (dataset.green + dataset.nir)
+    for stat in ndstat.stats:
+        assert np.allclose(result['ndwi_' + stat], getattr(nd, stat)(dim='time'), equal_nan=True)
+
+
+def _warmup_dataset(**dtypes):
+    times = np.array(['2015-01-01', '2015-02-01', '2015-03-01', '2015-04-01'], dtype='datetime64[ns]')
+    return xr.Dataset(data_vars={name: (('time', 'y', 'x'), (np.random.random((4, 6, 5)) * 200).astype(dtype))
+                                 for name, dtype in dtypes.items()},
+                      coords={'time': times}, attrs={'crs': 'Fake CRS'})
+
+
+@pytest.mark.skipif(stat_funcs.njit is None, reason='requires numba')
+@pytest.mark.parametrize('statistic,kernel,dataset', [
+    (WofsStats(), '_wofs_counts_kernel', _warmup_dataset(water='uint8')),
+    (NormalisedDifferenceStats('green', 'nir', 'ndwi'), '_nd_min_mean_max_kernel',
+     _warmup_dataset(green='float32', nir='float32')),
+    (Medoid(), '_argnanmedoid_kernel', _warmup_dataset(green='float32', nir='float32')),
+])
+def test_warmup_compiles_the_signature_used_by_compute(statistic, kernel, dataset):
+    kernel = getattr(stat_funcs, kernel)
+    statistic.warmup()
+    signatures = list(kernel.signatures)
+
+    # `apply_ufunc` hands the kernels transposed views of the loaded data
+    statistic.compute(dataset)
+
+    assert kernel.signatures == signatures
+
+
+@pytest.mark.skipif(stat_funcs.njit is None, reason='requires numba')
+def test_warmup_once_per_signature(monkeypatch):
+    monkeypatch.setattr(stat_funcs, '_WARMED_UP_KERNELS', set())
+    calls = []
+
+    def kernel(*args):
+        calls.append(args)
+
+    stat_funcs._warmup(kernel, np.zeros((1, 2), dtype=np.float32))
+    stat_funcs._warmup(kernel, np.ones((3, 4), dtype=np.float32))
+    assert len(calls) == 1
+
+    stat_funcs._warmup(kernel, np.zeros((1, 2), dtype=np.float64))
+    stat_funcs._warmup(kernel, np.zeros((4, 3), dtype=np.float32).T)
+    assert len(calls) == 3
+
+
 def test_tcw_stats():
     tc_stats = TCWStats()
     bands = ['blue', 'green', 'red', 'nir', 'swir1', 'swir2']
@@ -197,6 +288,7 @@ def eo_wofs_dataset(draw):
     return dataset
 
 
+@settings(deadline=None)
 @given(eo_wofs_dataset())
 def test_wofs_stats(dataset):
     wofsstat = WofsStats()
@@ -245,6 +337,7 @@ def two_band_eo_dataset(draw):
     return dataset
 
 
+@settings(deadline=None)
 @given(two_band_eo_dataset(), variable_name)
 def test_normalised_difference_stats(dataset, output_name):
     var1, var2 = list(dataset.data_vars)
@@ -271,7 +364,7 @@ def test_normalised_difference_stats(dataset, output_name):
 
 
 @pytest.mark.parametrize('stat_class', [Medoid, GeoMedian])
-@settings(max_examples=15)
+@settings(max_examples=15, deadline=None)
 @given(dataset=two_band_eo_dataset())
 def test_medoid_statistic(dataset, stat_class):
     stat = stat_class()
@@ -282,6 +375,25 @@ def test_medoid_statistic(dataset, stat_class):
     assert dataset.crs == result.crs
 
 
+def test_medoid_statistic_selects_medoid_observations():
+    arr = np.random.random((2, 6, 8, 7)).astype(np.float32)
+    arr[np.random.random(arr.shape) < 0.1] = np.NaN
+    times = np.array(['2015-01-%02d' % (day + 1) for day in range(6)], dtype='datetime64[ns]')
+    dataset = xr.Dataset(data_vars={'band%d' % i: (('time', 'y', 'x'), arr[i]) for i in range(2)},
+                         coords={'time': times}, attrs={'crs': 'Fake CRS'})
+
+    result = Medoid(minimum_valid_observations=3).compute(dataset)
+
+    valid = (~np.isnan(arr)).all(axis=0).sum(axis=0)
+    for iy in range(8):
+        for ix in range(7):
+            if valid[iy, ix] < 3:
+                assert np.isnan(result.band0.values[iy, ix])
+            else:
+                expected = arr[:, argnanmedoid(arr[:, :, iy, ix]), iy, ix]
+                assert (result.band0.values[iy, ix], result.band1.values[iy, ix]) == tuple(expected)
+
+
 def compute_incrementally(dataset, proc):
     for i in range(len(dataset.time)):
         time_slice = dataset.isel(time=[i])
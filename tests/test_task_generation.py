@@ -1,7 +1,11 @@
+import threading
+import time
+
 from mock import MagicMock
 from pandas._libs import json
 
 from datacube.utils.geometry import Geometry, CRS
+from datacube_stats.models import StatsTask
 from datacube_stats.tasks import NonGriddedTaskGenerator, ArbitraryTileMaker, GriddedTaskGenerator, \
     select_task_generator
 from datetime import datetime
@@ -66,6 +70,35 @@ def test_gridded_task_generation_with_datasets(mock_index):
     assert set(range(-50, -40)) == set(task.spatial_id['y'] for task in tasks)
 
 
+def test_gridded_task_generation_for_tile_list():
+    tile_indexes = [(x, y) for x in range(5) for y in range(3)]
+    gen = GriddedTaskGenerator(storage=EXAMPLE_STORAGE, tile_indexes=tile_indexes, max_concurrent_queries=3)
+
+    lock = threading.Lock()
+    running = []
+    most_running = []
+
+    def collect_tasks(workflow, time_period, sources_spec, tile_index=None, executor=None):
+        assert executor is None
+        with lock:
+            running.append(tile_index)
+            most_running.append(len(running))
+        # later tiles finish first
+        time.sleep(0.001 * (len(tile_indexes) - tile_indexes.index(tile_index)))
+        with lock:
+            running.remove(tile_index)
+        return [StatsTask(time_period, {'x': tile_index[0], 'y': tile_index[1], 'half': half})
+                for half in range(2)], 0
+
+    gen._collect_tasks = collect_tasks
+
+    tasks = list(gen(MagicMock(), EXAMPLE_SOURCES_SPEC, EXAMPLE_DATE_RANGE))
+
+    assert [(task.spatial_id['x'], task.spatial_id['y'], task.spatial_id['half']) for task in tasks] == \
+        [(x, y, half) for x, y in tile_indexes for half in range(2)]
+    assert max(most_running) <= 3
+
+
 def test_non_gridded_task_generation(mock_index):
     mock_index.datasets.search_eager.return_value = [FakeDataset()]
     mock_index.datasets.search.return_value = [FakeDataset()]
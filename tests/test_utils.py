@@ -2,7 +2,9 @@ from hypothesis.extra.numpy import arrays
 from hypothesis.strategies import integers
 from hypothesis import given
 import numpy as np
-from datacube_stats.utils import wofs_fuser
+import xarray as xr
+from datacube_stats.utils import wofs_fuser, sensible_mask_invalid_data
+from datacube_stats.utils.timer import MultiTimer
 
 
 def is_dry(data):
@@ -39,3 +41,80 @@ def test(dest, src):
 
     if is_dry(src) and is_dry(orig_dest):
         assert is_dry(dest)
+
+
+def test_merge_timers():
+    timer, other = MultiTimer(), MultiTimer()
+    for name in ('loading_data', 'writing_data'):
+        with timer.time(name):
+            pass
+    for name in ('loading_data', 'mean'):
+        with other.time(name):
+            pass
+    timer.max_rss['writing_data'] = 10
+    other.max_rss['loading_data'] = timer.max_rss['loading_data'] + 1
+    expected_run_times = {'loading_data': timer.run_times['loading_data'] + other.run_times['loading_data'],
+                          'writing_data': timer.run_times['writing_data'],
+                          'mean': other.run_times['mean']}
+    expected_max_rss = {'loading_data': other.max_rss['loading_data'],
+                        'writing_data': 10,
+                        'mean': other.max_rss['mean']}
+
+    assert timer.merge(other) is timer
+    assert dict(timer.run_times) == expected_run_times
+    assert dict(timer.max_rss) == expected_max_rss
+
+
+def _dataset_with_nodata(values, nodata):
+    return xr.Dataset({'red': (('y', 'x'), values, {'nodata': nodata, 'units': '1'})},
+                      attrs={'crs': 'Fake CRS'})
+
+
+def test_mask_invalid_integer_data():
+    data = _dataset_with_nodata(np.array([[1, -999], [-999, 4]], dtype=np.int16), -999)
+
+    result = sensible_mask_invalid_data(data)
+
+    assert result.red.dtype == np.float32
+    np.testing.assert_array_equal(result.red.values, [[1, np.nan], [np.nan, 4]])
+    assert (data.red.values == [[1, -999], [-999, 4]]).all()
+    assert result.red.attrs == {'units': '1'}
+    assert data.red.attrs == {'nodata': -999, 'units': '1'}
+    assert result.attrs == {'crs': 'Fake CRS'}
+
+    assert sensible_mask_invalid_data(data, dtype=np.float64).red.dtype == np.float64
+
+
+def test_mask_invalid_float_data_leaves_input_untouched():
+    values = np.array([[1, -1], [-1, 4]], dtype=np.float64)
+    data = _dataset_with_nodata(values, -1)
+
+    result = sensible_mask_invalid_data(data)
+
+    assert result.red.dtype == np.float64
+    np.testing.assert_array_equal(result.red.values, [[1, np.nan], [np.nan, 4]])
+    np.testing.assert_array_equal(values, [[1, -1], [-1, 4]])
+    assert result.red.attrs == {'units': '1'}
+    assert data.red.attrs == {'nodata': -1, 'units': '1'}
+
+
+def test_mask_invalid_dask_data():
+    data = _dataset_with_nodata(np.array([[1, -999], [-999, 4]], dtype=np.int16), -999).chunk({'x': 1})
+
+    result = sensible_mask_invalid_data(data)
+
+    assert result.red.chunks is not None
+    assert result.red.dtype == np.float32
+    np.testing.assert_array_equal(result.red.values, [[1, np.nan], [np.nan, 4]])
+    assert result.red.attrs == {'units': '1'}
+
+
+def test_mask_invalid_data_without_nodata():
+    data = xr.Dataset({'red': (('y', 'x'), np.array([[1., 2.]]), {'units': '1'})})
+
+    result = sensible_mask_invalid_data(data)
+
+    np.testing.assert_array_equal(result.red.values, [[1, 2]])
+    assert result.red.attrs == {'units': '1'}
+    result.red.attrs['units'] = 'm'
+    assert data.red.attrs == {'units': '1'}